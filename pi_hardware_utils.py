@@ -1,66 +1,270 @@
-import RPi.GPIO as GPIO
 import time
 import math
-import busio
-import board
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
 import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import RPi.GPIO as GPIO
+    import busio
+    import board
+    import adafruit_ads1x15.ads1115 as ADS
+    from adafruit_ads1x15.analog_in import AnalogIn
+except (ImportError, RuntimeError):
+    # Ohne Raspberry Pi (z. B. beim Abspielen eines Traces) fehlen die Hardware-Bibliotheken.
+    # Die Replay-Klassen in plant_trace.py greifen nicht darauf zu.
+    GPIO = busio = board = ADS = AnalogIn = None
 
 # Globale Konstanten für Hardware-Parameter
 TANK_VOLUME = 500  # Tankvolumen in ml bei 100% Füllstand
 PUMP_TIME_ONE_ML = 0.4  # Zeit in Sekunden, um 1 ml Wasser zu pumpen
+ENCODER_LOCK_S = 0.2  # Sperrzeit nach einem Drehschritt des Encoders
 ADC_MAX_VALUE = 26500  # Maximaler Rohwert des ADS1115
 
+# Abtastintervalle in Sekunden je nach Systemzustand
+SAMPLE_INTERVAL_PUMPING = 0.25  # Pumpe läuft: Tankabfall und Feuchteanstieg erfassen
+SAMPLE_INTERVAL_ACTIVE = 2.0  # Kurz vor einer geplanten Bewässerung bzw. kurz danach
+SAMPLE_INTERVAL_IDLE = 30.0  # Ruhezustand
+PRE_WATERING_WINDOW_S = 120  # Zeitfenster vor der nächsten Bewässerung mit erhöhter Rate
+POST_WATERING_WINDOW_S = 300  # Zeitfenster nach einem Pumpenlauf mit erhöhter Rate
+
+# Grenzen für Einschaltdauer und Stromversorgung der Pumpe
+PUMP_DUTY_WINDOW_S = 600  # Gleitendes Zeitfenster für die Einschaltdauer
+PUMP_MAX_DUTY = 0.25  # Maximaler Anteil der Laufzeit im Zeitfenster
+PUMP_MAX_ON_S = 30  # Längster ununterbrochener Lauf; größere Gaben werden in Pulse geteilt
+PUMP_COOLDOWN_S = 10  # Mindestpause zwischen zwei Läufen
+PUMP_SOAK_S = 60  # Pause zwischen den Pulsen einer Gabe, damit die Erde das Wasser aufnimmt
+SUPPLY_MAX_PARALLEL_PUMPS = 1  # Pumpen, die das Netzteil gleichzeitig versorgen kann
+
+# ADS1115-Register und Bitfelder des Config-Registers
+ADS_REG_CONVERSION = 0x00
+ADS_REG_CONFIG = 0x01
+ADS_REG_LO_THRESH = 0x02
+ADS_REG_HI_THRESH = 0x03
+ADS_DEFAULT_ADDRESS = 0x48
+
+# Multiplexer-Einstellung (Bits 14-12) je Kanal: vier Eingänge gegen GND und zwei Differenzeingänge
+ADS_CHANNEL_MUX = {
+    "P0": 0b100,
+    "P1": 0b101,
+    "P2": 0b110,
+    "P3": 0b111,
+    "P0-P1": 0b000,
+    "P2-P3": 0b011
+}
+ADS_GAIN_BITS = {2 / 3: 0b000, 1: 0b001, 2: 0b010, 4: 0b011, 8: 0b100, 16: 0b101}
+ADS_DATA_RATE_BITS = {8: 0, 16: 1, 32: 2, 64: 3, 128: 4, 250: 5, 475: 6, 860: 7}
+ADS_DEFAULT_GAIN = 1
+ADS_DEFAULT_DATA_RATE = 128
+
 class ADS1115:
     """
-    Klasse zur Interaktion mit dem ADS1115 ADC-Wandler über I2C.
+    Klasse zur Interaktion mit einem oder mehreren ADS1115 ADC-Wandlern über I2C.
     """
-    def __init__(self):
+    def __init__(self, addresses=(ADS_DEFAULT_ADDRESS,), alert_pins=None, recorder=None):
+        """
+        addresses: I2C-Adressen der angeschlossenen Boards. Das erste Board wird für
+        get_value() und die Sensor-Hilfsfunktionen verwendet.
+        alert_pins: Optionale Zuordnung {adresse: GPIO-Pin} der ALERT/RDY-Leitungen.
+        Sind alle Boards angeschlossen, wartet scan() auf die Flanke statt auf eine feste Zeit.
+        recorder: Optionaler TraceRecorder, der jeden gelesenen Wert aufzeichnet.
+        """
+        self.recorder = recorder
+        self.read_count = 0  # Anzahl der Lesezugriffe über den I2C-Bus
+        self.boards = {}
+        self.channel_settings = {channel: {"gain": ADS_DEFAULT_GAIN, "data_rate": ADS_DEFAULT_DATA_RATE}
+                                 for channel in ADS_CHANNEL_MUX}
+        self._ready_events = {}
         try:
             self.i2c = busio.I2C(board.SCL, board.SDA)
-            self.ads = ADS.ADS1115(self.i2c)
-            print("ADS1115 initialisiert.")
+            for address in addresses:
+                self.boards[address] = ADS.ADS1115(self.i2c, address=address)
+            self.ads = self.boards[addresses[0]]
+            logger.info("ADS1115 initialisiert (%d Board(s)).", len(self.boards))
         except Exception as e:
-            print(f"Fehler bei der Initialisierung des ADS1115: {e}")
+            logger.error("Fehler bei der Initialisierung des ADS1115: %s", e)
             self.ads = None
+            self.boards = {}
+            return
+
+        for address, pin in (alert_pins or {}).items():
+            if address in self.boards:
+                self._setup_ready_pin(address, pin)
+
+    def _setup_ready_pin(self, address, pin):
+        """
+        Konfiguriert ALERT/RDY eines Boards als Conversion-Ready-Signal und
+        registriert eine GPIO-Flankenerkennung dafür.
+        """
+        try:
+            # Hi_thresh-MSB = 1 und Lo_thresh-MSB = 0 schalten den Pin in den RDY-Modus
+            self._write_register(self.boards[address], ADS_REG_HI_THRESH, 0x8000)
+            self._write_register(self.boards[address], ADS_REG_LO_THRESH, 0x0000)
+            event = threading.Event()
+            GPIO.setwarnings(False)
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.add_event_detect(pin, GPIO.FALLING, callback=lambda _pin: event.set())
+            self._ready_events[address] = event
+            logger.info("ALERT/RDY für ADS1115 0x%02x auf Pin %d aktiviert.", address, pin)
+        except Exception as e:
+            logger.error("Fehler beim Einrichten von ALERT/RDY für ADS1115 0x%02x: %s", address, e)
+
+    def configure_channel(self, channel_name, gain=None, data_rate=None):
+        """
+        Setzt Verstärkung und Datenrate für einen Kanal.
+        """
+        if channel_name not in ADS_CHANNEL_MUX:
+            logger.error("Ungültiger Kanal '%s'.", channel_name)
+            return False
+        if gain is not None and gain not in ADS_GAIN_BITS:
+            logger.error("Ungültige Verstärkung %s. Erlaubt: %s", gain, list(ADS_GAIN_BITS))
+            return False
+        if data_rate is not None and data_rate not in ADS_DATA_RATE_BITS:
+            logger.error("Ungültige Datenrate %s. Erlaubt: %s", data_rate, list(ADS_DATA_RATE_BITS))
+            return False
+        settings = self.channel_settings[channel_name]
+        if gain is not None:
+            settings["gain"] = gain
+        if data_rate is not None:
+            settings["data_rate"] = data_rate
+        return True
 
     def get_value(self, channel_name):
         """
         Liest den Analogwert vom angegebenen ADC-Kanal.
         """
         if not self.ads:
-            print("ADS1115 ist nicht verfügbar.")
+            logger.warning("ADS1115 ist nicht verfügbar.", extra={"rate_limit_s": 300})
             return -1
 
-        read_channel = None
-        if channel_name == "P0":
-            read_channel = AnalogIn(self.ads, ADS.P0)
-        elif channel_name == "P1":
-            read_channel = AnalogIn(self.ads, ADS.P1)
-        # Weitere Kanäle bei Bedarf hinzufügen
-        else:
-            print(f"Fehler: Ungültiger Kanal '{channel_name}'.")
+        if channel_name not in ADS_CHANNEL_MUX:
+            logger.error("Ungültiger Kanal '%s'.", channel_name)
             return -1
-        return read_channel.value
+        settings = self.channel_settings[channel_name]
+        self.ads.gain = settings["gain"]
+        self.ads.data_rate = settings["data_rate"]
+        # "P0" -> AnalogIn(ads, P0), "P0-P1" -> AnalogIn(ads, P0, P1)
+        read_channel = AnalogIn(self.ads, *(getattr(ADS, pin) for pin in channel_name.split("-")))
+        self.read_count += 1
+        value = read_channel.value
+        if self.recorder:
+            self.recorder.record_adc(channel_name, value)
+        return value
+
+    def scan(self, channels=None):
+        """
+        Liest alle (oder die angegebenen) Kanäle auf allen Boards in einem Durchlauf.
+        Pro Kanal wird die Wandlung auf allen Boards gleichzeitig gestartet, einmal
+        gewartet und danach nur noch das Ergebnisregister gelesen. Das Abfragen des
+        Statusbits entfällt. Gibt {adresse: {kanal: rohwert}} zurück.
+        """
+        if not self.boards:
+            logger.warning("ADS1115 ist nicht verfügbar.", extra={"rate_limit_s": 300})
+            return {}
+
+        results = {address: {} for address in self.boards}
+        for channel_name in channels or ADS_CHANNEL_MUX:
+            if channel_name not in ADS_CHANNEL_MUX:
+                logger.error("Ungültiger Kanal '%s'.", channel_name)
+                continue
+            config = self._config_word(channel_name)
+            for address, ads in self.boards.items():
+                if address in self._ready_events:
+                    self._ready_events[address].clear()
+                self._write_register(ads, ADS_REG_CONFIG, config)
+            timed_out = self._wait_for_conversion(channel_name)
+            for board_index, (address, ads) in enumerate(self.boards.items()):
+                if address in timed_out:
+                    # Das Ergebnisregister enthält womöglich noch den vorherigen Kanal
+                    logger.warning("ADS1115 0x%02x: Wandlung von %s nicht fertig geworden.", address, channel_name,
+                                   extra={"rate_limit_s": 300})
+                    value = -1
+                else:
+                    value = self._read_register(ads, ADS_REG_CONVERSION)
+                    self.read_count += 1
+                results[address][channel_name] = value
+                if self.recorder:
+                    self.recorder.record_adc(channel_name, value, board_index)
+        return results
+
+    def _config_word(self, channel_name):
+        """
+        Baut das Config-Register für eine Single-Shot-Wandlung des Kanals.
+        """
+        settings = self.channel_settings[channel_name]
+        comparator_queue = 0b00 if self._ready_events else 0b11  # 0b11 deaktiviert ALERT/RDY
+        return (1 << 15
+                | ADS_CHANNEL_MUX[channel_name] << 12
+                | ADS_GAIN_BITS[settings["gain"]] << 9
+                | 1 << 8
+                | ADS_DATA_RATE_BITS[settings["data_rate"]] << 5
+                | comparator_queue)
+
+    def _wait_for_conversion(self, channel_name):
+        """
+        Wartet auf das Ende der Wandlung: per ALERT/RDY-Flanke, wenn alle Boards
+        angeschlossen sind, sonst die Wandlungszeit der Datenrate plus 10% Toleranz.
+        Gibt die Adressen der Boards zurück, deren Wandlung nicht fertig wurde.
+        """
+        conversion_time = 1.0 / self.channel_settings[channel_name]["data_rate"]
+        timed_out = set()
+        if self._ready_events and len(self._ready_events) == len(self.boards):
+            for address, event in self._ready_events.items():
+                if not event.wait(conversion_time * 2) and \
+                        not self._poll_conversion_ready(self.boards[address], conversion_time):
+                    timed_out.add(address)
+        else:
+            time.sleep(conversion_time * 1.1 + 0.0002)
+        return timed_out
+
+    def _poll_conversion_ready(self, ads, conversion_time):
+        """
+        Rückfallebene, falls eine RDY-Flanke verpasst wurde: OS-Bit abfragen.
+        Gibt False zurück, wenn die Wandlung bis zur Frist nicht fertig ist.
+        """
+        deadline = time.monotonic() + conversion_time * 2
+        while time.monotonic() < deadline:
+            if self._read_register(ads, ADS_REG_CONFIG) & 0x8000:
+                return True
+            time.sleep(0.0005)
+        return False
+
+    @staticmethod
+    def _write_register(ads, register, value):
+        with ads.i2c_device as device:
+            device.write(bytes([register, (value >> 8) & 0xFF, value & 0xFF]))
+
+    @staticmethod
+    def _read_register(ads, register):
+        """Liest ein 16-Bit-Register als vorzeichenbehafteten Wert."""
+        buffer = bytearray(2)
+        with ads.i2c_device as device:
+            device.write_then_readinto(bytes([register]), buffer)
+        value = (buffer[0] << 8) | buffer[1]
+        return value - 0x10000 if value & 0x8000 else value
+
+    @staticmethod
+    def raw_to_percent(value):
+        """
+        Wandelt einen Rohwert in Prozent des maximalen Sensorwerts um.
+        """
+        if value == -1: return 0
+        percentage = math.floor((value / ADC_MAX_VALUE) * 100)
+        return max(0, min(100, percentage))
 
     def moisture_sensor_status(self):
         """
         Liest den Feuchtigkeitssensorwert und wandelt ihn in Prozent um.
         """
-        value = self.get_value("P0")
-        if value == -1: return 0
-        moisture_percentage = math.floor((value / ADC_MAX_VALUE) * 100)
-        return max(0, min(100, moisture_percentage))
+        return self.raw_to_percent(self.get_value("P0"))
 
     def tank_level(self):
         """
         Liest den Tankfüllstandssensorwert und wandelt ihn in Prozent um.
         """
-        value = self.get_value("P1")
-        if value == -1: return 0
-        tank_percentage = math.floor(((value / ADC_MAX_VALUE) * 100))
-        return max(0, min(100, tank_percentage))
+        return self.raw_to_percent(self.get_value("P1"))
 
     def tank_level_ml(self):
         """
@@ -72,72 +276,291 @@ class ADS1115:
         return (self.tank_level() / 100) * TANK_VOLUME
 
 
+class AdaptiveSampler:
+    """
+    Bestimmt das Abtastintervall der Sensoren abhängig vom Systemzustand.
+    Läuft die Pumpe, wird schnell abgetastet, vor und nach einer Bewässerung
+    mittel und im Ruhezustand nur selten.
+    """
+    def __init__(self, pre_watering_window_s=PRE_WATERING_WINDOW_S, post_watering_window_s=POST_WATERING_WINDOW_S):
+        self.pre_watering_window_s = pre_watering_window_s
+        self.post_watering_window_s = post_watering_window_s
+        self.intervals = {
+            "pumping": SAMPLE_INTERVAL_PUMPING,
+            "active": SAMPLE_INTERVAL_ACTIVE,
+            "idle": SAMPLE_INTERVAL_IDLE
+        }
+        self.mode = "idle"
+        self.rate_changes = 0
+        self.samples = 0
+        self.started_at = time.time()
+        self._last_sample_time = None
+        self._pump_stopped_at = None
+        self._pump_was_running = False
+
+    @property
+    def interval(self):
+        return self.intervals[self.mode]
+
+    def update(self, now, pump_running, next_watering_time=None):
+        """
+        Wählt den Abtastmodus anhand des Pumpenzustands und der nächsten
+        geplanten Bewässerung. Gibt den aktuellen Modus zurück.
+        """
+        if self._pump_was_running and not pump_running:
+            self._pump_stopped_at = now
+        self._pump_was_running = pump_running
+
+        if pump_running:
+            mode = "pumping"
+        elif next_watering_time is not None and 0 <= next_watering_time - now <= self.pre_watering_window_s:
+            mode = "active"
+        elif self._pump_stopped_at is not None and now - self._pump_stopped_at <= self.post_watering_window_s:
+            mode = "active"
+        else:
+            mode = "idle"
+
+        if mode != self.mode:
+            logger.info("Abtastrate geändert: %s -> %s (%s s).", self.mode, mode, self.intervals[mode],
+                        extra={"event": "sampling_mode", "mode": mode})
+            self.mode = mode
+            self.rate_changes += 1
+        return mode
+
+    def due(self, now):
+        """Gibt an, ob im aktuellen Modus eine neue Messung fällig ist."""
+        return self._last_sample_time is None or now - self._last_sample_time >= self.interval
+
+    def mark_sampled(self, now):
+        self._last_sample_time = now
+        self.samples += 1
+
+    def stats(self, i2c_reads=0):
+        """Statistik über Abtastmodus, Ratenwechsel und Buslast."""
+        elapsed_min = max(time.time() - self.started_at, 1) / 60
+        return {
+            "mode": self.mode,
+            "interval_s": self.interval,
+            "rate_changes": self.rate_changes,
+            "samples": self.samples,
+            "i2c_reads": i2c_reads,
+            "i2c_reads_per_min": round(i2c_reads / elapsed_min, 2)
+        }
+
+
 class RotaryEncoder:
     """
     Klasse zur Interaktion mit einem KY-040 Drehgeber.
     """
-    def __init__(self, menu_system_instance, clockPin=5, dataPin=6, switchPin=13):
+    def __init__(self, menu_system_instance, clockPin=5, dataPin=6, switchPin=13, recorder=None):
         GPIO.setwarnings(False)
         GPIO.setmode(GPIO.BCM)
         self.clockPin = clockPin
         self.dataPin = dataPin
         self.switchPin = switchPin
-        self.lock = False
         self.menu_system = menu_system_instance
+        self.recorder = recorder
+        self._locked_until = 0.0
 
         GPIO.setup(clockPin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         GPIO.setup(dataPin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         GPIO.setup(switchPin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
-    def time_thread_encoder_func(self):
-        time.sleep(0.2)
-        self.lock = False
-
     def start_thread(self):
         GPIO.add_event_detect(self.clockPin, GPIO.FALLING, callback=self._clock_callback, bouncetime=50)
         GPIO.add_event_detect(self.switchPin, GPIO.FALLING, callback=self._switch_callback, bouncetime=300)
-        print("Rotary Encoder Event-Erkennung gestartet.")
+        logger.info("Rotary Encoder Event-Erkennung gestartet.")
 
     def stop_thread(self):
         GPIO.remove_event_detect(self.clockPin)
         GPIO.remove_event_detect(self.switchPin)
-        print("Rotary Encoder Event-Erkennung gestoppt.")
+        logger.info("Rotary Encoder Event-Erkennung gestoppt.")
 
     def _clock_callback(self, pin):
-        if not self.lock:
-            self.lock = True
-            if GPIO.input(self.dataPin) == 1:
-                if self.menu_system: self.menu_system.navigate('right')
-            else:
-                if self.menu_system: self.menu_system.navigate('left')
-            threading.Thread(target=self.time_thread_encoder_func, daemon=True).start()
+        data_level = GPIO.input(self.dataPin)
+        if self.recorder:
+            self.recorder.record_gpio(self.clockPin, data_level)
+        self.handle_clock_edge(data_level)
 
     def _switch_callback(self, pin):
-        if GPIO.input(self.switchPin) == 0:
+        switch_level = GPIO.input(self.switchPin)
+        if self.recorder:
+            self.recorder.record_gpio(self.switchPin, switch_level)
+        self.handle_switch_edge(switch_level)
+
+    def handle_clock_edge(self, data_level, now=None):
+        """
+        Wertet eine fallende Flanke am Clock-Pin aus. Nach einem Schritt werden
+        weitere Flanken für ENCODER_LOCK_S ignoriert. `now` erlaubt eine
+        vorgegebene Zeitbasis beim Abspielen eines Traces.
+        """
+        now = time.monotonic() if now is None else now
+        if now < self._locked_until:
+            return
+        self._locked_until = now + ENCODER_LOCK_S
+        if data_level == 1:
+            if self.menu_system: self.menu_system.navigate('right')
+        else:
+            if self.menu_system: self.menu_system.navigate('left')
+
+    def handle_switch_edge(self, switch_level):
+        if switch_level == 0:
             if self.menu_system: self.menu_system.confirm_selection()
 
 
+class PumpDutyScheduler:
+    """
+    Plant Pumpenläufe so, dass jede Pumpe im gleitenden Zeitfenster höchstens
+    max_duty der Zeit läuft, zwischen zwei Läufen abkühlt und nie mehr als
+    max_parallel Pumpen gleichzeitig am Netzteil hängen. Gebuchte Läufe werden
+    je Pumpe als (start, ende) gespeichert; Zeiten werden immer übergeben,
+    damit die Planung unabhängig von der Uhr bleibt. Threadsicher.
+    """
+    def __init__(self, window_s=PUMP_DUTY_WINDOW_S, max_duty=PUMP_MAX_DUTY, max_on_s=PUMP_MAX_ON_S,
+                 cooldown_s=PUMP_COOLDOWN_S, soak_s=PUMP_SOAK_S, max_parallel=SUPPLY_MAX_PARALLEL_PUMPS):
+        self.window_s = window_s
+        self.max_duty = max_duty
+        self.max_on_s = max_on_s
+        self.cooldown_s = cooldown_s
+        self.soak_s = soak_s
+        self.max_parallel = max_parallel
+        self._lock = threading.Lock()
+        self._runs = {}  # pumpen_id -> [[start, ende], ...], zeitlich sortiert
+        self._counters = {}  # pumpen_id -> {"pulses", "throttled", "throttle_wait_s"}
+
+    @property
+    def max_pulse_s(self):
+        return min(self.max_on_s, self.max_duty * self.window_s)
+
+    def pulses(self, duration_s):
+        """Teilt eine Gabe in gleich lange Pulse, die jeweils in die Grenzen passen."""
+        if duration_s <= 0:
+            return []
+        count = math.ceil(duration_s / self.max_pulse_s - 1e-9)
+        return [duration_s / count] * count
+
+    def _duty_start(self, runs, duration_s, t):
+        """
+        Frühester Start ab t, bei dem das Zeitfenster, das mit dem Ende des
+        neuen Laufs endet, höchstens max_duty Laufzeit enthält. Spätere
+        Fenster enthalten weniger alte Laufzeit und sind damit ebenfalls erfüllt.
+        """
+        budget = self.max_duty * self.window_s - duration_s
+        on_time = 0.0
+        for start, end in reversed(runs):
+            if on_time + end - start > budget:
+                # Ab diesem Zeitpunkt x liegt genau noch `budget` Laufzeit im Fenster
+                x = end - (budget - on_time)
+                return max(t, x + self.window_s - duration_s)
+            on_time += end - start
+        return t
+
+    def _earliest_locked(self, pump_id, duration_s, now):
+        t = now
+        runs = self._runs.get(pump_id, [])
+        while True:
+            if runs:
+                t = max(t, runs[-1][1] + self.cooldown_s)
+            t = self._duty_start(runs, duration_s, t)
+            # Versorgungsbudget (konservativ: jede Überschneidung zählt als gleichzeitiger Lauf)
+            overlapping = [end for other_id, other_runs in self._runs.items() if other_id != pump_id
+                           for start, end in other_runs if start < t + duration_s and end > t]
+            if len(overlapping) < self.max_parallel:
+                return t
+            t = min(overlapping)
+
+    def earliest_start(self, pump_id, duration_s, now):
+        """Frühester zulässiger Startzeitpunkt ab `now`, ohne zu buchen."""
+        with self._lock:
+            return self._earliest_locked(pump_id, duration_s, now)
+
+    def reserve(self, pump_id, duration_s, now):
+        """Bucht den frühesten zulässigen Lauf ab `now` und gibt dessen Startzeit zurück."""
+        with self._lock:
+            start = self._earliest_locked(pump_id, duration_s, now)
+            runs = self._runs.setdefault(pump_id, [])
+            runs.append([start, start + duration_s])
+            # Läufe, die für kein Zeitfenster mehr zählen, verwerfen
+            while runs and runs[0][1] < now - self.window_s:
+                runs.pop(0)
+            counters = self._counters.setdefault(pump_id, {"pulses": 0, "throttled": 0, "throttle_wait_s": 0.0})
+            counters["pulses"] += 1
+            if start > now:
+                counters["throttled"] += 1
+                counters["throttle_wait_s"] += start - now
+            return start
+
+    def complete(self, pump_id, start, end):
+        """Trägt das tatsächliche Ende eines gebuchten Laufs ein (z. B. nach einem Abbruch)."""
+        with self._lock:
+            runs = self._runs.get(pump_id, [])
+            for index in range(len(runs) - 1, -1, -1):
+                if runs[index][0] == start:
+                    if end <= start:
+                        del runs[index]
+                    else:
+                        runs[index][1] = end
+                    return
+
+    def stats(self, now):
+        """Einschaltdauer im aktuellen Zeitfenster und Drosselungen je Pumpe."""
+        with self._lock:
+            pumps = {}
+            for pump_id, runs in self._runs.items():
+                on_s = sum(max(0.0, min(end, now) - max(start, now - self.window_s)) for start, end in runs)
+                pumps[pump_id] = dict(self._counters.get(pump_id, {}), on_s=round(on_s, 1),
+                                      duty=round(on_s / self.window_s, 3))
+                pumps[pump_id]["throttle_wait_s"] = round(pumps[pump_id].get("throttle_wait_s", 0.0), 1)
+        return {
+            "limits": {"window_s": self.window_s, "max_duty": self.max_duty, "max_on_s": self.max_on_s,
+                       "cooldown_s": self.cooldown_s, "soak_s": self.soak_s, "max_parallel": self.max_parallel},
+            "pumps": pumps
+        }
+
+
 class Pump:
     """
     Klasse zur Steuerung einer 12V Rohrpumpe.
     """
-    def __init__(self, pumpPin=21):
+    def __init__(self, pumpPin=21, on_state_change=None, recorder=None, scheduler=None):
         GPIO.setwarnings(False)
         GPIO.setmode(GPIO.BCM)
         self.pumpPin = pumpPin
+        self.running = False
+        # Optionaler Callback, der bei jedem Schalten der Pumpe mit dem neuen Zustand aufgerufen wird
+        self.on_state_change = on_state_change
+        self.recorder = recorder
+        # Optionaler PumpDutyScheduler; ohne ihn laufen Gaben wie bisher am Stück
+        self.scheduler = scheduler
         GPIO.setup(self.pumpPin, GPIO.OUT, initial=GPIO.LOW)
-        print(f"Pumpe auf Pin {self.pumpPin} initialisiert.")
+        logger.info("Pumpe auf Pin %d initialisiert.", self.pumpPin)
+
+    def set_state(self, on):
+        """
+        Schaltet den Pumpenausgang und meldet den neuen Zustand.
+        """
+        GPIO.output(self.pumpPin, GPIO.HIGH if on else GPIO.LOW)
+        self._state_changed(on)
+
+    def _state_changed(self, on):
+        self.running = on
+        if self.recorder:
+            self.recorder.record_pump(self.pumpPin, on)
+        if self.on_state_change:
+            try:
+                self.on_state_change(on)
+            except Exception as e:
+                logger.error("Fehler im Pumpen-Callback: %s", e)
 
     def pump_timer(self, watering_amount_ml):
         """
         Steuert die Pumpe für eine Dauer basierend auf der Wassermenge.
         """
         duration = watering_amount_ml * PUMP_TIME_ONE_ML
-        print(f"Pumpe startet für {duration:.2f} Sekunden, um {watering_amount_ml} ml zu liefern.")
-        GPIO.output(self.pumpPin, GPIO.HIGH)
-        time.sleep(duration)
-        GPIO.output(self.pumpPin, GPIO.LOW)
-        print("Pumpe gestoppt.")
+        logger.info("Pumpe startet für %.2f Sekunden, um %s ml zu liefern.", duration, watering_amount_ml,
+                    extra={"event": "pump_start", "duration_s": duration, "amount_ml": watering_amount_ml})
+        self._run(duration)
+        logger.info("Pumpe gestoppt.", extra={"event": "pump_stop"})
 
     def pump_for_duration(self, duration_s):
         """
@@ -145,36 +568,69 @@ class Pump:
         """
         if duration_s <= 0:
             return
-        print(f"Pumpe startet für {duration_s} Sekunden (manueller Befehl).")
-        GPIO.output(self.pumpPin, GPIO.HIGH)
-        time.sleep(duration_s)
-        GPIO.output(self.pumpPin, GPIO.LOW)
-        print("Pumpe nach manueller Zeit gestoppt.")
+        logger.info("Pumpe startet für %s Sekunden (manueller Befehl).", duration_s,
+                    extra={"event": "pump_start", "duration_s": duration_s})
+        self._run(duration_s)
+        logger.info("Pumpe nach manueller Zeit gestoppt.", extra={"event": "pump_stop"})
 
+    def _run(self, duration_s):
+        """
+        Lässt die Pumpe insgesamt duration_s laufen. Mit Scheduler wird die Gabe
+        in Pulse mit Sickerpausen geteilt und jeder Puls erst gestartet, wenn
+        Einschaltdauer, Abkühlzeit und Versorgungsbudget es zulassen.
+        """
+        if not self.scheduler:
+            self.set_state(True)
+            try:
+                self._wait(duration_s)
+            finally:
+                self.set_state(False)
+            return
+
+        pulses = self.scheduler.pulses(duration_s)
+        not_before = time.time()
+        for index, pulse_s in enumerate(pulses, 1):
+            now = time.time()
+            start = self.scheduler.reserve(self.pumpPin, pulse_s, max(now, not_before))
+            if start - now > 0:
+                logger.info("Pumpe wartet %.1f s vor Puls %d/%d (Sickerpause/Einschaltdauer).", start - now, index, len(pulses),
+                            extra={"event": "pump_throttled", "wait_s": round(start - now, 1)})
+                self._wait(start - now)
+            self.set_state(True)
+            try:
+                self._wait(pulse_s)
+            finally:
+                self.set_state(False)
+                self.scheduler.complete(self.pumpPin, start, time.time())
+            not_before = time.time() + self.scheduler.soak_s
+
+    def _wait(self, duration_s):
+        """Wartet während eines Pumpenlaufs; beim Replay wird nur die Zeitbasis weitergestellt."""
+        time.sleep(duration_s)
 
     def start_pump_automatic(self, watering_amount_ml, precheck_instance):
         """
         Startet die automatische Bewässerung nach Vorabprüfungen.
         """
         if precheck_instance.water_tank(watering_amount_ml) and precheck_instance.moisture_sensor():
-            print("Vorabprüfungen bestanden. Starte automatischen Pumpenbetrieb.")
+            logger.info("Vorabprüfungen bestanden. Starte automatischen Pumpenbetrieb.")
             threading.Thread(target=self.pump_timer, args=(watering_amount_ml,), daemon=True).start()
         else:
-            print("Automatische Bewässerung kann nicht gestartet werden.")
+            logger.warning("Automatische Bewässerung kann nicht gestartet werden.")
 
     def start_pump_manual(self):
         """
         Schaltet die Pumpe manuell ein.
         """
-        print("Manuelle Pumpe AN.")
-        GPIO.output(self.pumpPin, GPIO.HIGH)
+        logger.info("Manuelle Pumpe AN.", extra={"event": "pump_start"})
+        self.set_state(True)
 
     def stop_pump_manual(self):
         """
         Schaltet die Pumpe manuell aus.
         """
-        print("Manuelle Pumpe AUS.")
-        GPIO.output(self.pumpPin, GPIO.LOW)
+        logger.info("Manuelle Pumpe AUS.", extra={"event": "pump_stop"})
+        self.set_state(False)
 
 
 class PreWateringCheck:
@@ -192,7 +648,8 @@ class PreWateringCheck:
         if current_tank_ml >= watering_amount_ml:
             return True
         else:
-            print(f"Tankfüllstand NIEDRIG: {current_tank_ml:.2f} ml verfügbar, benötigt {watering_amount_ml} ml.")
+            logger.warning("Tankfüllstand NIEDRIG: %.2f ml verfügbar, benötigt %s ml.", current_tank_ml, watering_amount_ml,
+                           extra={"rate_limit_s": 600})
             return False
 
     def moisture_sensor(self, moisture_max_threshold=30, moisture_sensor_use=1):
@@ -208,5 +665,6 @@ class PreWateringCheck:
         if current_moisture < moisture_max_threshold:
             return True
         else:
-            print(f"Boden zu feucht: {current_moisture}% (Schwelle: < {moisture_max_threshold}%).")
+            logger.info("Boden zu feucht: %s%% (Schwelle: < %s%%).", current_moisture, moisture_max_threshold,
+                        extra={"rate_limit_s": 600})
             return False
@@ -0,0 +1,192 @@
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Schwellwerte der Anomalieerkennung ---
+FLATLINE_WINDOW_S = 6 * 3600  # Auswertefenster für hängende Sensoren
+FLATLINE_MIN_SAMPLES = 20  # Mindestanzahl Messungen pro Fenster
+FLATLINE_MAX_VARIANCE = 0.25  # Varianz der Rohwerte, unter der ein Sensor als hängend gilt
+PUMP_SETTLE_S = 120  # Nach einem Pumpenlauf werden Tankänderungen so lange nicht als Leck gewertet
+DRY_RUN_CHECK_DELAY_S = 10  # Wartezeit nach Pumpenende bis zur Prüfung des Tankabfalls
+DRY_RUN_MIN_EXPECTED_DROP = 2.0  # Erst ab diesem erwarteten Abfall (in %) ist die Prüfung aussagekräftig
+DRY_RUN_MIN_DROP_FRACTION = 0.3  # Anteil des erwarteten Abfalls, der mindestens erreicht werden muss
+LEAK_ALLOWANCE_PER_H = 0.5  # Erlaubter Abfall in %/h (Verdunstung, Rauschen)
+LEAK_THRESHOLD = 5.0  # CUSUM-Schwelle in %
+REFILL_RISE = 10.0  # Anstieg in %, der als Nachfüllen gilt
+MOISTURE_RESPONSE_WINDOW_S = 1800  # Zeitfenster für den Feuchteanstieg nach dem Gießen
+MOISTURE_MIN_RISE = 2  # Mindestanstieg der Feuchtigkeit in %
+
+ANOMALY_DESCRIPTIONS = {
+    "moisture_stuck": "Feuchtesensor liefert konstante Werte",
+    "tank_stuck": "Tanksensor liefert konstante Werte",
+    "dry_run": "Tankfüllstand sinkt beim Pumpen nicht (Trockenlauf oder defekter Tanksensor)",
+    "leak": "Tankfüllstand sinkt außerhalb von Pumpenläufen (Leck)",
+    "no_moisture_response": "Feuchtigkeit steigt nach dem Gießen nicht an"
+}
+MOISTURE_ANOMALIES = ("moisture_stuck", "no_moisture_response")
+
+
+class RunningStats:
+    """Mittelwert und Varianz nach Welford, O(1) pro Wert."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class AnomalyDetector:
+    """
+    Online-Erkennung von Auffälligkeiten in den Sensordaten. Jede Messung
+    aktualisiert nur laufende Statistiken (O(1)):
+    - hängende Sensoren: Varianz der Rohwerte je Zeitfenster (Welford)
+    - Trockenlauf: Tank sinkt während eines Pumpenlaufs nicht wie erwartet
+    - Leck: CUSUM über den Tankabfall außerhalb von Pumpenläufen
+    - fehlende Reaktion: Feuchtigkeit steigt nach dem Gießen nicht an
+    Solange eine Anomalie aktiv ist, sollte nicht automatisch gegossen werden.
+    """
+    def __init__(self):
+        self.anomalies = {}
+        self.reset()
+
+    def reset(self):
+        """Setzt alle Anomalien und Statistiken zurück (z. B. nach dem Umtopfen)."""
+        if self.anomalies:
+            logger.info("Anomalien zurückgesetzt: %s", ", ".join(self.anomalies))
+        self.anomalies = {}
+        self._window = {"moisture": RunningStats(), "tank": RunningStats()}
+        self._window_start = None
+        self.tank_noise = RunningStats()  # Tankänderung pro Messung außerhalb von Pumpenläufen, je Zeitfenster
+        self._previous_noise_std = 0.0  # Streuung des letzten abgeschlossenen Fensters
+        self._leak_cusum = 0.0
+        self._last_time = None
+        self._last_moisture = None
+        self._last_tank = None
+        self._pump_running = False
+        self._settle_until = 0.0
+        self._pump_run = None  # Daten des laufenden bzw. noch zu prüfenden Pumpenlaufs
+        self._moisture_check = None
+
+    def _set(self, name, active):
+        if active and name not in self.anomalies:
+            self.anomalies[name] = ANOMALY_DESCRIPTIONS[name]
+            logger.warning("Anomalie erkannt: %s", ANOMALY_DESCRIPTIONS[name], extra={"event": "anomaly", "anomaly": name})
+        elif not active and name in self.anomalies:
+            del self.anomalies[name]
+            logger.info("Anomalie aufgehoben: %s", ANOMALY_DESCRIPTIONS[name], extra={"event": "anomaly_cleared", "anomaly": name})
+
+    def blocking_reasons(self, moisture_sensor_use=1):
+        """Aktive Anomalien, die eine automatische Bewässerung verhindern."""
+        return [description for name, description in self.anomalies.items()
+                if moisture_sensor_use or name not in MOISTURE_ANOMALIES]
+
+    def pump_started(self, timestamp, expected_drop_percent):
+        self._pump_running = True
+        self._pump_run = {
+            "expected_drop": expected_drop_percent,
+            "start_tank": self._last_tank,
+            "min_tank": self._last_tank,
+            "start_moisture": self._last_moisture,
+            "stopped_at": None
+        }
+
+    def pump_stopped(self, timestamp):
+        self._pump_running = False
+        self._settle_until = timestamp + PUMP_SETTLE_S
+        self._leak_cusum = 0.0
+        if self._pump_run:
+            self._pump_run["stopped_at"] = timestamp
+            if self._pump_run["start_moisture"] is not None:
+                self._moisture_check = {
+                    "baseline": self._pump_run["start_moisture"],
+                    "deadline": timestamp + MOISTURE_RESPONSE_WINDOW_S
+                }
+
+    def update(self, timestamp, moisture, tank_percent, moisture_raw=None, tank_raw=None):
+        """
+        Verarbeitet eine Messung (Prozentwerte, optional Rohwerte für die
+        Erkennung hängender Sensoren). Gibt die aktiven Anomalien zurück.
+        """
+        self._update_flatline(timestamp, moisture if moisture_raw is None else moisture_raw,
+                              tank_percent if tank_raw is None else tank_raw)
+        self._update_pump_run(timestamp, tank_percent)
+        self._update_moisture_response(timestamp, moisture)
+        self._update_leak(timestamp, tank_percent)
+        self._last_time = timestamp
+        self._last_moisture = moisture
+        self._last_tank = tank_percent
+        return self.anomalies
+
+    def _update_flatline(self, timestamp, moisture_value, tank_value):
+        if self._window_start is None:
+            self._window_start = timestamp
+        self._window["moisture"].update(moisture_value)
+        self._window["tank"].update(tank_value)
+        if timestamp - self._window_start < FLATLINE_WINDOW_S:
+            return
+        for channel, stats in self._window.items():
+            if stats.count >= FLATLINE_MIN_SAMPLES:
+                self._set(f"{channel}_stuck", stats.variance < FLATLINE_MAX_VARIANCE)
+            stats.reset()
+        # Auch das Tankrauschen nur über das Fenster mitteln, damit alte Störungen die Leckschwelle nicht dauerhaft anheben
+        self._previous_noise_std = self.tank_noise.std
+        self.tank_noise.reset()
+        self._window_start = timestamp
+
+    def _update_pump_run(self, timestamp, tank_percent):
+        run = self._pump_run
+        if run is None:
+            return
+        if run["start_tank"] is None:
+            run["start_tank"] = run["min_tank"] = tank_percent
+        run["min_tank"] = min(run["min_tank"], tank_percent)
+        if run["stopped_at"] is None or timestamp - run["stopped_at"] < DRY_RUN_CHECK_DELAY_S:
+            return
+        if run["expected_drop"] >= DRY_RUN_MIN_EXPECTED_DROP:
+            drop = run["start_tank"] - run["min_tank"]
+            self._set("dry_run", drop < run["expected_drop"] * DRY_RUN_MIN_DROP_FRACTION)
+        self._pump_run = None
+
+    def _update_moisture_response(self, timestamp, moisture):
+        check = self._moisture_check
+        if check is None:
+            return
+        if moisture - check["baseline"] >= MOISTURE_MIN_RISE:
+            self._set("no_moisture_response", False)
+            self._moisture_check = None
+        elif timestamp >= check["deadline"]:
+            self._set("no_moisture_response", True)
+            self._moisture_check = None
+
+    def _update_leak(self, timestamp, tank_percent):
+        if self._last_tank is None or self._pump_running or timestamp < self._settle_until:
+            return
+        drop = self._last_tank - tank_percent
+        if drop <= -REFILL_RISE:
+            # Tank wurde nachgefüllt: ein Leck oder Trockenlauf gilt als behoben
+            self._leak_cusum = 0.0
+            self._set("leak", False)
+            self._set("dry_run", False)
+            return
+        self.tank_noise.update(drop)
+        elapsed_h = (timestamp - self._last_time) / 3600
+        self._leak_cusum = max(0.0, self._leak_cusum + drop - LEAK_ALLOWANCE_PER_H * elapsed_h)
+        if self._leak_cusum > LEAK_THRESHOLD + 3 * max(self.tank_noise.std, self._previous_noise_std):
+            self._set("leak", True)
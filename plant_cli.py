@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Bewusst nur leichte Module: kein Tk, keine Adafruit-/GPIO-Bibliotheken,
+# damit der Aufruf auch aus Cronjobs schnell bleibt.
+from plant_history import HistoryStore, summarize_history
+from plant_logging import read_recent_events
+from plant_commands import enqueue_command, wait_for_command_result, withdraw_command, COMMAND_TTL_S
+
+WATERING_STATUS_FILE = 'watering_status.json'  # Wie in plant_watering_system.py
+DEFAULT_WAIT_TIMEOUT_S = 300
+
+HISTORY_RANGES = {"24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+
+# Rückgabewerte für Skripte; "status" liefert EXIT_FAILED bei aktiven Anomalien
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_TIMEOUT = 2
+
+
+def load_status():
+    try:
+        with open(WATERING_STATUS_FILE, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%d.%m.%Y %H:%M:%S") if timestamp else "-"
+
+
+def print_fields(fields, indent=""):
+    for key, value in fields.items():
+        if isinstance(value, dict):
+            print(f"{indent}{key}:")
+            print_fields(value, indent + "  ")
+        else:
+            print(f"{indent}{key}: {value}")
+
+
+def output(args, data, render):
+    if args.json:
+        json.dump(data, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        render(data)
+
+
+# --- Befehle ---
+def cmd_status(args):
+    status = load_status()
+    if status is None:
+        print(f"'{WATERING_STATUS_FILE}' nicht gefunden oder fehlerhaft.", file=sys.stderr)
+        return EXIT_FAILED
+    metrics = status.get("metrics") or {}
+    data = {
+        "pump_running": status.get("pump_running", False),
+        "last_watering_time": status.get("last_watering_time"),
+        "estimated_next_watering_time": status.get("estimated_next_watering_time"),
+        "remaining_watering_cycles": status.get("remaining_watering_cycles"),
+        "latest_readings": metrics.get("latest_readings"),
+        "anomalies": status.get("anomalies") or {},
+        "status_age_s": round(time.time() - os.path.getmtime(WATERING_STATUS_FILE), 1)
+    }
+
+    def render(data):
+        print(f"Pumpe:               {'an' if data['pump_running'] else 'aus'}")
+        print(f"Letzte Bewässerung:  {format_time(data['last_watering_time'])}")
+        print(f"Nächste Bewässerung: {format_time(data['estimated_next_watering_time'])}")
+        print(f"Verbleibende Zyklen: {data['remaining_watering_cycles']}")
+        readings = data["latest_readings"] or {}
+        if readings:
+            print(f"Feuchtigkeit:        {readings.get('moisture', '-')} %")
+            print(f"Tankfüllstand:       {readings.get('tank_percent', '-')} %")
+        for description in data["anomalies"].values():
+            print(f"Anomalie:            {description}")
+        print(f"Stand vor:           {data['status_age_s']} s")
+
+    output(args, data, render)
+    return EXIT_FAILED if data["anomalies"] else EXIT_OK
+
+
+def cmd_history(args):
+    store = HistoryStore()
+    store.refresh()
+    end = time.time()
+    start = end - HISTORY_RANGES[args.range]
+    data = dict(summarize_history(store.samples_between(start, end), store.events_between(start, end)),
+                range=args.range, start=start, end=end)
+
+    def render(data):
+        print(f"Zeitraum {data['range']}: {format_time(data['start'])} - {format_time(data['end'])}")
+        print(f"Messwerte: {data['samples']}, Bewässerungen: {data['waterings']} ({data['watered_ml']} ml)")
+        for name, label in (("moisture", "Feuchtigkeit"), ("tank_percent", "Tankfüllstand")):
+            values = data[name]
+            if values:
+                print(f"{label}: min {values['min']} %, max {values['max']} %, "
+                      f"Mittel {values['mean']} %, zuletzt {values['last']} %")
+            else:
+                print(f"{label}: keine Daten")
+
+    output(args, data, render)
+    return EXIT_OK
+
+
+def cmd_metrics(args):
+    status = load_status()
+    if status is None:
+        print(f"'{WATERING_STATUS_FILE}' nicht gefunden oder fehlerhaft.", file=sys.stderr)
+        return EXIT_FAILED
+    output(args, status.get("metrics") or {}, print_fields)
+    return EXIT_OK
+
+
+def cmd_events(args):
+    def render(events):
+        for event in events:
+            print(f"{format_time(event.get('time'))} {event.get('level', ''):7} {event.get('message', '')}")
+
+    output(args, read_recent_events(limit=args.n), render)
+    return EXIT_OK
+
+
+def submit(args, action, **params):
+    # Beim Warten verfällt der Befehl mit der Wartezeit, damit ein gestopptes
+    # Hauptsystem nach dem Neustart keine aufgestauten Gaben ausführt
+    command_id = enqueue_command(action, ttl_s=args.timeout if args.wait else COMMAND_TTL_S, **params)
+    if not args.wait:
+        output(args, {"id": command_id, "status": "queued"}, lambda data: print(f"Befehl {data['id']} eingereiht."))
+        return EXIT_OK
+
+    result = wait_for_command_result(command_id, args.timeout)
+    if result is None:
+        withdrawn = withdraw_command(command_id)
+        output(args, {"id": command_id, "status": "timeout", "withdrawn": withdrawn},
+               lambda data: print(f"Keine Rückmeldung für Befehl {data['id']} nach {args.timeout} s"
+                                  f" ({'zurückgezogen' if withdrawn else 'wird bereits ausgeführt'})."))
+        return EXIT_TIMEOUT
+    output(args, result, print_fields)
+    return EXIT_OK if result.get("status") == "done" else EXIT_FAILED
+
+
+def cmd_pump(args):
+    if args.ml is not None:
+        if args.ml <= 0:
+            print("Die Menge muss größer als 0 sein.", file=sys.stderr)
+            return EXIT_FAILED
+        return submit(args, "pump_manual", amount_ml=args.ml)
+    if args.seconds <= 0:
+        print("Die Dauer muss größer als 0 sein.", file=sys.stderr)
+        return EXIT_FAILED
+    return submit(args, "pump_timed", duration_s=args.seconds)
+
+
+def cmd_repot(args):
+    return submit(args, "repot_reset")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Kommandozeilen-Client für das Bewässerungssystem")
+    parser.add_argument("--json", action="store_true", help="Ausgabe als JSON")
+    parser.add_argument("--dir", help="Arbeitsverzeichnis des Bewässerungssystems (Standard: aktuelles Verzeichnis)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="Aktuellen Status anzeigen").set_defaults(func=cmd_status)
+
+    history = subparsers.add_parser("history", help="Zusammenfassung des Verlaufs")
+    history.add_argument("--range", choices=HISTORY_RANGES, default="24h")
+    history.set_defaults(func=cmd_history)
+
+    subparsers.add_parser("metrics", help="Laufzeitmetriken anzeigen").set_defaults(func=cmd_metrics)
+
+    events = subparsers.add_parser("events", help="Letzte Ereignisse anzeigen")
+    events.add_argument("-n", type=int, default=20, help="Anzahl der Ereignisse")
+    events.set_defaults(func=cmd_events)
+
+    for name, help_text, func in (("pump", "Pumpe manuell starten", cmd_pump),
+                                  ("repot", "Umtopf-Reset auslösen", cmd_repot)):
+        command = subparsers.add_parser(name, help=help_text)
+        if name == "pump":
+            amount = command.add_mutually_exclusive_group(required=True)
+            amount.add_argument("--ml", type=float, help="Menge in ml")
+            amount.add_argument("--seconds", type=float, help="Laufzeit in Sekunden")
+        command.add_argument("--wait", action="store_true", help="Auf die Ausführung warten")
+        command.add_argument("--timeout", type=float, default=DEFAULT_WAIT_TIMEOUT_S,
+                             help="Maximale Wartezeit in Sekunden")
+        command.set_defaults(func=func)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.dir:
+        os.chdir(args.dir)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
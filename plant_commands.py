@@ -0,0 +1,119 @@
+import json
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- Befehlswarteschlange ---
+# Jeder Befehl ist eine eigene Datei in PUMP_COMMAND_DIR und wird in der
+# Reihenfolge der Dateinamen abgearbeitet. Nach der Ausführung legt das
+# Hauptsystem eine <id>.done-Datei mit dem Ergebnis ab. Anders als die
+# einzelne pump_command.json gehen so keine Befehle verloren, wenn mehrere
+# Clients gleichzeitig senden.
+PUMP_COMMAND_DIR = 'pump_commands'
+COMMAND_RESULT_MAX_AGE_S = 3600  # Nicht abgeholte Ergebnisse werden danach gelöscht
+COMMAND_TTL_S = 600  # Befehle, die länger unbearbeitet liegen, werden verworfen
+
+
+def enqueue_command(action, ttl_s=COMMAND_TTL_S, **params):
+    """
+    Legt einen Befehl in der Warteschlange ab und gibt seine ID zurück. Wird er
+    nicht innerhalb von ttl_s Sekunden abgeholt, verwirft ihn das Hauptsystem.
+    """
+    os.makedirs(PUMP_COMMAND_DIR, exist_ok=True)
+    command_id = f"{time.time_ns()}-{os.getpid()}"
+    queued_at = time.time()
+    command = dict(params, action=action, id=command_id, queued_at=queued_at, expires_at=queued_at + ttl_s)
+    path = os.path.join(PUMP_COMMAND_DIR, command_id + '.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(command, f)
+    # Umbenennen ist atomar, das Hauptsystem sieht nie eine halb geschriebene Datei
+    os.replace(path + '.tmp', path)
+    return command_id
+
+
+def dequeue_command():
+    """
+    Entnimmt den ältesten gültigen Befehl aus der Warteschlange oder gibt None
+    zurück. Abgelaufene Befehle werden mit dem Ergebnis "rejected" verworfen.
+    """
+    try:
+        names = sorted(name for name in os.listdir(PUMP_COMMAND_DIR) if name.endswith('.json'))
+    except FileNotFoundError:
+        return None
+    for name in names:
+        path = os.path.join(PUMP_COMMAND_DIR, name)
+        try:
+            with open(path, 'r') as f:
+                command = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            command = None
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        if not command:
+            continue
+        if command.get("expires_at", float("inf")) < time.time():
+            logger.warning("Abgelaufener Befehl '%s' verworfen (eingereiht vor %.0f s).", command.get("action"),
+                           time.time() - command.get("queued_at", 0), extra={"event": "command_expired"})
+            report_command_result(command, "rejected", reason="Befehl abgelaufen")
+            continue
+        return command
+    return None
+
+
+def withdraw_command(command_id):
+    """
+    Nimmt einen noch nicht abgeholten Befehl aus der Warteschlange zurück.
+    Gibt False zurück, wenn das Hauptsystem ihn bereits übernommen hat.
+    """
+    try:
+        os.remove(os.path.join(PUMP_COMMAND_DIR, command_id + '.json'))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def report_command_result(command, status, **details):
+    """Hinterlegt das Ergebnis eines Befehls aus der Warteschlange (status: done, failed, rejected)."""
+    command_id = command.get("id")
+    if not command_id:
+        return
+    result = dict(details, id=command_id, action=command.get("action"), status=status, finished_at=time.time())
+    path = os.path.join(PUMP_COMMAND_DIR, command_id + '.done')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(result, f)
+    os.replace(path + '.tmp', path)
+
+
+def wait_for_command_result(command_id, timeout_s, poll_interval_s=0.2):
+    """Wartet auf das Ergebnis eines Befehls. Gibt None bei Zeitüberschreitung zurück."""
+    path = os.path.join(PUMP_COMMAND_DIR, command_id + '.done')
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            with open(path, 'r') as f:
+                result = json.load(f)
+            os.remove(path)
+            return result
+        except (FileNotFoundError, json.JSONDecodeError):
+            time.sleep(poll_interval_s)
+    return None
+
+
+def cleanup_command_results(max_age_s=COMMAND_RESULT_MAX_AGE_S):
+    """Löscht alte, nie abgeholte Ergebnisdateien."""
+    cutoff = time.time() - max_age_s
+    try:
+        names = os.listdir(PUMP_COMMAND_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(PUMP_COMMAND_DIR, name)
+        try:
+            if name.endswith(('.done', '.tmp')) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,205 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Nicht-Unix-Systeme: nur die Sperre innerhalb des Prozesses
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# --- Verlaufsdatei ---
+# Eine Zeile pro Eintrag, es wird nur angehängt:
+#   <zeitstempel>,S,<feuchtigkeit_%>,<tank_%>   Messwert
+#   <zeitstempel>,W,<menge_ml>                  Bewässerung
+HISTORY_FILE = 'history.csv'
+HISTORY_RETENTION_S = 30 * 86400  # 30 Tage
+HISTORY_COMPACT_INTERVAL_S = 86400  # Abstand der Bereinigung durch das Hauptsystem
+
+
+class HistoryStore:
+    """
+    Verlauf der Sensorwerte und Bewässerungen. Mehrere Prozesse können in
+    dieselbe Datei schreiben; refresh() liest nur die seit dem letzten Aufruf
+    angehängten Zeilen ein und hält die letzten 30 Tage im Speicher.
+    Die Listen im Speicher sind durch eine Sperre geschützt, weil der
+    Monitor-Thread sie aktualisiert, während die UI daraus liest.
+    Anhängen und compact() sind zusätzlich über eine Sperrdatei zwischen
+    den Prozessen serialisiert; wird die Datei ersetzt, liest refresh()
+    sie neu ein.
+    """
+    def __init__(self, path=HISTORY_FILE, retention_s=HISTORY_RETENTION_S):
+        self.path = path
+        self.retention_s = retention_s
+        self.samples = []  # (zeitstempel, feuchtigkeit, tank_prozent), zeitlich sortiert
+        self.events = []  # (zeitstempel, menge_ml), zeitlich sortiert
+        self._offset = 0
+        self._inode = None
+        self._compacted_at = 0.0
+        self._lock = threading.RLock()
+
+    def append_sample(self, timestamp, moisture, tank_percent):
+        self._append(f"{timestamp:.1f},S,{moisture},{tank_percent}\n")
+
+    def append_event(self, timestamp, amount_ml):
+        self._append(f"{timestamp:.1f},W,{amount_ml:g}\n")
+
+    @contextmanager
+    def _file_lock(self):
+        """Exklusive Sperre über die Sperrdatei neben dem Verlauf."""
+        with self._lock, open(self.path + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _append(self, line):
+        try:
+            with self._file_lock(), open(self.path, 'a') as f:
+                f.write(line)
+        except OSError as e:
+            logger.error("Fehler beim Schreiben des Verlaufs: %s", e, extra={"rate_limit_s": 60})
+
+    def refresh(self):
+        """
+        Liest neu angehängte Zeilen ein. Gibt (neue_messwerte, neue_ereignisse) zurück.
+        """
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        known = (self.samples[-1][0] if self.samples else 0.0, self.events[-1][0] if self.events else 0.0)
+        try:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                replaced = stat.st_ino != self._inode or stat.st_size < self._offset
+                if replaced:
+                    # Von compact() ersetzt (oder erster Aufruf): vollständig neu einlesen
+                    self._inode, self._offset = stat.st_ino, 0
+                    self.samples, self.events = [], []
+                f.seek(self._offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], []
+
+        # Nur vollständige Zeilen verarbeiten, der Rest folgt beim nächsten Aufruf
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        self._offset += len(complete)
+
+        new_samples, new_events = [], []
+        for line in complete.decode('utf-8', errors='replace').splitlines():
+            parts = line.split(',')
+            try:
+                if parts[1] == 'S':
+                    new_samples.append((float(parts[0]), int(parts[2]), int(parts[3])))
+                elif parts[1] == 'W':
+                    new_events.append((float(parts[0]), float(parts[2])))
+            except (IndexError, ValueError):
+                continue
+
+        self.samples.extend(new_samples)
+        self.events.extend(new_events)
+        self._expire(time.time() - self.retention_s)
+        if replaced:
+            # Nach dem Neueinlesen nur wirklich neue Einträge melden
+            new_samples = [sample for sample in new_samples if sample[0] > known[0]]
+            new_events = [event for event in new_events if event[0] > known[1]]
+        return new_samples, new_events
+
+    def _expire(self, cutoff):
+        del self.samples[:bisect.bisect_left(self.samples, (cutoff,))]
+        del self.events[:bisect.bisect_left(self.events, (cutoff,))]
+
+    def samples_between(self, start, end):
+        with self._lock:
+            return self.samples[bisect.bisect_left(self.samples, (start,)):bisect.bisect_left(self.samples, (end,))]
+
+    def events_between(self, start, end):
+        with self._lock:
+            return self.events[bisect.bisect_left(self.events, (start,)):bisect.bisect_left(self.events, (end,))]
+
+    def compact(self):
+        """
+        Entfernt Einträge, die älter als die Aufbewahrungsdauer sind, aus der Datei.
+        Sollte nur vom Hauptsystem aufgerufen werden; die Sperrdatei verhindert,
+        dass dabei angehängte Zeilen anderer Prozesse verloren gehen.
+        """
+        self._compacted_at = time.time()
+        cutoff = self._compacted_at - self.retention_s
+
+        def timestamp(line):
+            try:
+                return float(line.split(',', 1)[0])
+            except ValueError:
+                return 0.0
+
+        try:
+            with self._file_lock():
+                try:
+                    with open(self.path, 'r') as f:
+                        lines = f.readlines()
+                except FileNotFoundError:
+                    return
+                kept = [line for line in lines if line.endswith('\n') and timestamp(line) >= cutoff]
+                if len(kept) == len(lines):
+                    return
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    f.writelines(kept)
+                os.replace(tmp_path, self.path)
+            logger.info("Verlauf bereinigt: %d alte Einträge entfernt.", len(lines) - len(kept))
+        except OSError as e:
+            logger.error("Fehler beim Bereinigen des Verlaufs: %s", e)
+
+    def compact_if_due(self, interval_s=HISTORY_COMPACT_INTERVAL_S):
+        """Bereinigt den Verlauf, wenn die letzte Bereinigung länger als `interval_s` zurückliegt."""
+        if time.time() - self._compacted_at >= interval_s:
+            self.compact()
+
+
+def minmax_buckets(points, start, bucket_s, count, value_index):
+    """
+    Reduziert zeitlich sortierte Punkte auf `count` gleich breite Zeitfenster.
+    Je Fenster wird [minimum, maximum, letzter_wert] geliefert (None bei
+    fehlenden Daten), so bleiben Spitzen bei einer Spalte pro Pixel sichtbar.
+    """
+    buckets = [None] * count
+    for point in points:
+        index = int((point[0] - start) // bucket_s)
+        if not 0 <= index < count:
+            continue
+        value = point[value_index]
+        bucket = buckets[index]
+        if bucket is None:
+            buckets[index] = [value, value, value]
+        else:
+            if value < bucket[0]:
+                bucket[0] = value
+            elif value > bucket[1]:
+                bucket[1] = value
+            bucket[2] = value
+    return buckets
+
+
+def summarize_history(samples, events):
+    """
+    Kennzahlen eines Verlaufsausschnitts: Anzahl, Minimum, Maximum, Mittelwert
+    und letzter Wert je Sensor sowie Anzahl und Menge der Bewässerungen.
+    """
+    summary = {
+        "samples": len(samples),
+        "waterings": len(events),
+        "watered_ml": round(sum(amount for _, amount in events), 1)
+    }
+    for name, index in (("moisture", 1), ("tank_percent", 2)):
+        values = [sample[index] for sample in samples]
+        summary[name] = {
+            "min": min(values),
+            "max": max(values),
+            "mean": round(sum(values) / len(values), 1),
+            "last": values[-1]
+        } if values else None
+    return summary
@@ -0,0 +1,165 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+# --- Logging-Konfiguration ---
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+RECENT_EVENTS_FILE = 'recent_events.json'  # Schnappschuss des Ringpuffers für UI und CLI
+RING_CAPACITY = 500  # Anzahl der im Speicher gehaltenen Ereignisse
+RING_DUMP_INTERVAL_S = 2.0  # Mindestabstand zwischen zwei Schnappschüssen
+
+# Attribute, die jeder LogRecord besitzt; alles andere sind strukturierte Zusatzfelder (extra=...)
+_RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime", "rate_limit_s"}
+
+_listener = None
+_ring_handler = None
+
+
+def record_fields(record):
+    """Gibt die strukturierten Zusatzfelder eines LogRecords zurück."""
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Unterdrückt Wiederholungen derselben Meldung innerhalb eines Zeitfensters.
+    Gilt nur für Meldungen mit extra={"rate_limit_s": <sekunden>}; verglichen
+    wird das Text-Template, so dass sich ändernde Messwerte nicht zählen.
+    Die Zahl der unterdrückten Wiederholungen steht im Feld "suppressed".
+    """
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._seen = {}  # (logger, level, template) -> [letzte_ausgabe, unterdrückt]
+
+    def filter(self, record):
+        interval = getattr(record, "rate_limit_s", 0)
+        if not interval:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry and record.created - entry[0] < interval:
+                entry[1] += 1
+                return False
+            if entry and entry[1]:
+                record.suppressed = entry[1]
+            self._seen[key] = [record.created, 0]
+        return True
+
+
+class PlantFormatter(logging.Formatter):
+    """Hängt strukturierte Zusatzfelder an die Textausgabe an."""
+    def format(self, record):
+        text = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Hält die letzten Ereignisse als Dictionaries im Speicher. Optional wird
+    regelmäßig ein Schnappschuss in eine JSON-Datei geschrieben, damit andere
+    Prozesse (UI, CLI) die Ereignisse anzeigen können.
+    """
+    def __init__(self, capacity=RING_CAPACITY, dump_path=None, dump_interval_s=RING_DUMP_INTERVAL_S):
+        super().__init__()
+        self.events = deque(maxlen=capacity)
+        self.dump_path = dump_path
+        self.dump_interval_s = dump_interval_s
+        self._last_dump = 0.0
+
+    def emit(self, record):
+        try:
+            event = {
+                "time": record.created,
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage()
+            }
+            event.update(record_fields(record))
+            self.events.append(event)
+            if self.dump_path and record.created - self._last_dump >= self.dump_interval_s:
+                self.dump()
+        except Exception:
+            self.handleError(record)
+
+    def snapshot(self, limit=None):
+        events = list(self.events)
+        return events[-limit:] if limit else events
+
+    def dump(self):
+        """Schreibt den Ringpuffer atomar in die Schnappschussdatei."""
+        if not self.dump_path:
+            return
+        tmp_path = self.dump_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(list(self.events), f, default=str)
+        os.replace(tmp_path, self.dump_path)
+        self._last_dump = time.time()
+
+    def close(self):
+        try:
+            self.dump()
+        except OSError:
+            pass
+        super().close()
+
+
+def setup_logging(level=logging.INFO, ring_file=None):
+    """
+    Richtet nicht-blockierendes Logging ein: Meldungen landen in einer Queue,
+    Konsolenausgabe und Ringpuffer laufen in einem eigenen Listener-Thread.
+    Gibt den RingBufferHandler zurück.
+    """
+    global _listener, _ring_handler
+    if _listener:
+        return _ring_handler
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(PlantFormatter(LOG_FORMAT))
+    _ring_handler = RingBufferHandler(dump_path=ring_file)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, _ring_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _ring_handler
+
+
+def shutdown_logging():
+    """Arbeitet die Queue ab und beendet den Listener-Thread."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+        _ring_handler.close()
+
+
+def recent_events(limit=None):
+    """Ereignisse aus dem Ringpuffer des eigenen Prozesses."""
+    return _ring_handler.snapshot(limit) if _ring_handler else []
+
+
+def read_recent_events(path=RECENT_EVENTS_FILE, limit=None):
+    """Ereignisse aus dem Schnappschuss eines anderen Prozesses."""
+    try:
+        with open(path, 'r') as f:
+            events = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return events[-limit:] if limit else events
@@ -0,0 +1,546 @@
+import os
+import json
+import time
+import zlib
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import threading
+from collections import deque
+
+from plant_anomaly import RunningStats
+
+logger = logging.getLogger(__name__)
+
+# --- Telemetrie ---
+# Jeder Knoten sammelt Messwerte, Bewässerungen und Metriken und schickt sie
+# gebündelt als zlib-komprimiertes JSON an einen Sammler:
+#   TCP: 4 Byte Länge (big endian) + Nutzdaten, Antwort 8 Byte Sequenznummer
+#   UDP: ein Datagramm pro Bündel, Antwort ein Datagramm mit der Sequenznummer
+# Erst nach der Bestätigung gilt ein Bündel als zugestellt. Nicht zugestellte
+# Bündel landen im Spool-Verzeichnis und werden beim nächsten Mal zuerst gesendet.
+TELEMETRY_PORT = 7020
+TELEMETRY_SPOOL_DIR = 'telemetry_spool'
+TELEMETRY_FLUSH_INTERVAL_S = 30  # Abstand zwischen zwei Sendeversuchen
+TELEMETRY_MAX_BATCH_RECORDS = 500  # Datensätze pro Bündel
+TELEMETRY_SPOOL_MAX_FILES = 2000  # Darüber werden die ältesten Bündel verworfen
+TELEMETRY_SEND_TIMEOUT_S = 5.0
+TELEMETRY_UDP_RETRIES = 2
+UDP_MAX_PAYLOAD = 60000  # Größere Bündel werden für UDP aufgeteilt
+MAX_FRAME_BYTES = 1 << 20  # Obergrenze für ein Bündel (komprimiert und entpackt)
+ROLLUP_FILE = 'fleet_rollups.json'
+ROLLUP_DUMP_INTERVAL_S = 10
+DEDUP_WINDOW = 1000  # Zuletzt gesehene Sequenznummern pro Knoten
+
+FRAME_HEADER = struct.Struct("!I")
+ACK = struct.Struct("!Q")
+
+
+def encode_batch(node_id, seq, records):
+    batch = {"node": node_id, "seq": seq, "sent_at": time.time(), "records": records}
+    return zlib.compress(json.dumps(batch, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_batch(payload):
+    """Entpackt ein Bündel; zu große oder fehlerhafte Daten lösen ValueError aus."""
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(payload, MAX_FRAME_BYTES)
+        if decompressor.unconsumed_tail:
+            raise ValueError("Bündel zu groß")
+        batch = json.loads(data)
+    except (zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Bündel nicht lesbar: {e}") from e
+    if not isinstance(batch, dict) or not isinstance(batch.get("seq"), int) or not batch.get("node"):
+        raise ValueError("Bündel ohne Knoten oder Sequenznummer")
+    return batch
+
+
+class TelemetryExporter:
+    """
+    Sammelt Telemetriedaten eines Knotens und sendet sie gebündelt an den
+    Sammler. add_*() ist threadsicher und kostet nur ein append; flush()
+    blockiert für Netzwerk und Spool und gehört daher nicht in den Loop-Thread.
+    """
+    def __init__(self, node_id, host, port=TELEMETRY_PORT, protocol="tcp", spool_dir=TELEMETRY_SPOOL_DIR,
+                 timeout_s=TELEMETRY_SEND_TIMEOUT_S):
+        if protocol not in ("tcp", "udp"):
+            raise ValueError(f"Unbekanntes Protokoll '{protocol}'.")
+        self.node_id = node_id
+        self.address = (host, port)
+        self.protocol = protocol
+        self.spool_dir = spool_dir
+        self.timeout_s = timeout_s
+        self.stats = {"sent_batches": 0, "sent_bytes": 0, "spooled_batches": 0, "dropped_batches": 0,
+                      "send_failures": 0, "last_error": None}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._records = []
+        self._sock = None
+        self._last_seq = 0
+
+    # --- Erfassung ---
+    def _add(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def add_reading(self, timestamp, moisture, tank_percent):
+        self._add({"type": "reading", "t": round(timestamp, 1), "moisture": moisture, "tank_percent": tank_percent})
+
+    def add_watering(self, timestamp, amount_ml, source):
+        self._add({"type": "watering", "t": round(timestamp, 1), "amount_ml": amount_ml, "source": source})
+
+    def add_status(self, timestamp, metrics, anomalies):
+        self._add({"type": "status", "t": round(timestamp, 1), "metrics": metrics, "anomalies": anomalies})
+
+    @property
+    def pending_records(self):
+        with self._lock:
+            return len(self._records)
+
+    # --- Versand ---
+    def _next_seq(self):
+        # Zeitbasiert, damit die Nummern auch über Neustarts hinweg eindeutig und aufsteigend bleiben
+        self._last_seq = max(self._last_seq + 1, time.time_ns())
+        return self._last_seq
+
+    def _encode(self, records):
+        """Erzeugt [(seq, nutzdaten)]; für UDP werden zu große Bündel halbiert."""
+        seq = self._next_seq()
+        payload = encode_batch(self.node_id, seq, records)
+        if self.protocol == "udp" and len(payload) > UDP_MAX_PAYLOAD and len(records) > 1:
+            middle = len(records) // 2
+            return self._encode(records[:middle]) + self._encode(records[middle:])
+        return [(seq, payload)]
+
+    def flush(self):
+        """
+        Sendet zuerst gespoolte, dann neue Bündel. Ist der Sammler nicht
+        erreichbar, werden die neuen Bündel gespoolt. Gibt die Zahl der
+        zugestellten Bündel zurück.
+        """
+        with self._lock:
+            records, self._records = self._records, []
+        with self._flush_lock:
+            batches = []
+            for start in range(0, len(records), TELEMETRY_MAX_BATCH_RECORDS):
+                batches += self._encode(records[start:start + TELEMETRY_MAX_BATCH_RECORDS])
+
+            delivered = 0
+            reachable = True
+            for path in self._spooled_files():
+                seq = int(os.path.basename(path).split('.')[0])
+                try:
+                    with open(path, 'rb') as f:
+                        payload = f.read()
+                except OSError:
+                    continue
+                if not self._send(seq, payload):
+                    reachable = False
+                    break
+                os.remove(path)
+                delivered += 1
+            if delivered:
+                logger.info("%d gespoolte Telemetrie-Bündel nachgesendet.", delivered)
+
+            for seq, payload in batches:
+                if reachable and self._send(seq, payload):
+                    delivered += 1
+                else:
+                    reachable = False
+                    self._spool(seq, payload)
+            self._trim_spool()
+            return delivered
+
+    def _send(self, seq, payload):
+        try:
+            if self.protocol == "tcp":
+                acked = self._send_tcp(payload)
+            else:
+                acked = self._send_udp(seq, payload)
+            if acked != seq:
+                raise OSError(f"falsche Bestätigung {acked} für {seq}")
+        except OSError as e:
+            self.stats["send_failures"] += 1
+            self.stats["last_error"] = str(e)
+            self._close_socket()
+            logger.warning("Telemetrie-Sammler %s:%d nicht erreichbar: %s", *self.address, e, extra={"rate_limit_s": 300})
+            return False
+        self.stats["sent_batches"] += 1
+        self.stats["sent_bytes"] += len(payload)
+        return True
+
+    def _send_tcp(self, payload):
+        if self._sock is None:
+            self._sock = socket.create_connection(self.address, timeout=self.timeout_s)
+        self._sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+        reply = b""
+        while len(reply) < ACK.size:
+            chunk = self._sock.recv(ACK.size - len(reply))
+            if not chunk:
+                raise ConnectionError("Verbindung vom Sammler geschlossen")
+            reply += chunk
+        return ACK.unpack(reply)[0]
+
+    def _send_udp(self, seq, payload):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.settimeout(self.timeout_s / (TELEMETRY_UDP_RETRIES + 1))
+            self._sock.connect(self.address)
+        for _ in range(TELEMETRY_UDP_RETRIES + 1):
+            self._sock.send(payload)
+            try:
+                # Verspätete Bestätigungen früherer Bündel überspringen
+                while True:
+                    reply = self._sock.recv(ACK.size)
+                    if len(reply) == ACK.size and ACK.unpack(reply)[0] == seq:
+                        return seq
+            except socket.timeout:
+                continue
+        raise OSError("keine Bestätigung per UDP")
+
+    def _close_socket(self):
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def close(self):
+        with self._flush_lock:
+            self._close_socket()
+
+    # --- Spool ---
+    def _spooled_files(self):
+        try:
+            names = sorted(name for name in os.listdir(self.spool_dir) if name.endswith('.tlm'))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.spool_dir, name) for name in names]
+
+    def _spool(self, seq, payload):
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = os.path.join(self.spool_dir, f"{seq:020d}.tlm")
+            with open(path + '.tmp', 'wb') as f:
+                f.write(payload)
+            os.replace(path + '.tmp', path)
+            self.stats["spooled_batches"] += 1
+        except OSError as e:
+            self.stats["dropped_batches"] += 1
+            logger.error("Telemetrie-Bündel konnte nicht gespoolt werden: %s", e, extra={"rate_limit_s": 300})
+
+    def _trim_spool(self):
+        files = self._spooled_files()
+        for path in files[:max(0, len(files) - TELEMETRY_SPOOL_MAX_FILES)]:
+            try:
+                os.remove(path)
+                self.stats["dropped_batches"] += 1
+            except OSError:
+                pass
+
+    def spool_size(self):
+        return len(self._spooled_files())
+
+
+# --- Sammler ---
+class NodeRollup:
+    """Laufende Kennzahlen eines Knotens; jedes Bündel wird nur einmal verarbeitet."""
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.first_seen = None
+        self.last_seen = None
+        self.last_address = None
+        self.batches = 0
+        self.duplicates = 0
+        self.records = 0
+        self.readings = 0
+        self.moisture = RunningStats()
+        self.tank = RunningStats()
+        self.moisture_range = [None, None]
+        self.last_reading = None
+        self.waterings = 0
+        self.watered_ml = 0.0
+        self.watered_by_source = {}
+        self.last_status = None
+        self._seen = set()
+        self._seen_order = deque()
+
+    def is_duplicate(self, seq):
+        if seq in self._seen:
+            self.duplicates += 1
+            return True
+        self._seen.add(seq)
+        self._seen_order.append(seq)
+        if len(self._seen_order) > DEDUP_WINDOW:
+            self._seen.discard(self._seen_order.popleft())
+        return False
+
+    def ingest(self, batch, address, now):
+        self.first_seen = self.first_seen or now
+        self.last_seen = now
+        self.last_address = address
+        self.batches += 1
+        for record in batch.get("records", ()):
+            self.records += 1
+            kind = record.get("type")
+            if kind == "reading":
+                self._add_reading(record)
+            elif kind == "watering":
+                amount = record.get("amount_ml") or 0
+                source = record.get("source", "unknown")
+                self.waterings += 1
+                self.watered_ml += amount
+                self.watered_by_source[source] = self.watered_by_source.get(source, 0) + amount
+            elif kind == "status":
+                self.last_status = record
+
+    def _add_reading(self, record):
+        moisture, tank_percent = record.get("moisture"), record.get("tank_percent")
+        if moisture is None or tank_percent is None:
+            return
+        self.readings += 1
+        self.moisture.update(moisture)
+        self.tank.update(tank_percent)
+        low, high = self.moisture_range
+        self.moisture_range = [moisture if low is None else min(low, moisture),
+                               moisture if high is None else max(high, moisture)]
+        if self.last_reading is None or record.get("t", 0) >= self.last_reading.get("t", 0):
+            self.last_reading = record
+
+    def summary(self):
+        status = self.last_status or {}
+        return {
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "address": self.last_address,
+            "batches": self.batches,
+            "duplicates": self.duplicates,
+            "records": self.records,
+            "readings": self.readings,
+            "moisture": {"mean": round(self.moisture.mean, 1), "std": round(self.moisture.std, 1),
+                         "min": self.moisture_range[0], "max": self.moisture_range[1]} if self.readings else None,
+            "tank_percent": {"mean": round(self.tank.mean, 1), "std": round(self.tank.std, 1)} if self.readings else None,
+            "last_reading": self.last_reading,
+            "waterings": self.waterings,
+            "watered_ml": round(self.watered_ml, 1),
+            "watered_by_source": self.watered_by_source,
+            "anomalies": status.get("anomalies") or {},
+            "metrics": status.get("metrics")
+        }
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, collector):
+        self.collector = collector
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        seq = self.collector.ingest(data, f"udp:{addr[0]}:{addr[1]}")
+        if seq is not None:
+            self.transport.sendto(ACK.pack(seq), addr)
+
+
+class TelemetryCollector:
+    """
+    Nimmt Bündel vieler Knoten parallel per TCP und UDP entgegen (asyncio)
+    und führt je Knoten laufende Kennzahlen. Die Übersicht wird regelmäßig
+    in eine JSON-Datei geschrieben.
+    """
+    def __init__(self, host="0.0.0.0", port=TELEMETRY_PORT, rollup_file=ROLLUP_FILE):
+        self.host = host
+        self.port = port
+        self.rollup_file = rollup_file
+        self.nodes = {}
+        self.stats = {"batches": 0, "duplicates": 0, "rejected": 0, "connections": 0}
+        self._servers = []
+        self._clients = {}  # Task -> StreamWriter der offenen TCP-Verbindungen
+
+    def ingest(self, payload, address):
+        """Verarbeitet ein Bündel. Gibt die zu bestätigende Sequenznummer oder None zurück."""
+        try:
+            batch = decode_batch(payload)
+        except ValueError as e:
+            self.stats["rejected"] += 1
+            logger.warning("Ungültiges Telemetrie-Bündel von %s: %s", address, e, extra={"rate_limit_s": 60})
+            return None
+        node = self.nodes.get(batch["node"])
+        if node is None:
+            node = self.nodes[batch["node"]] = NodeRollup(batch["node"])
+            logger.info("Neuer Knoten: %s (%s)", batch["node"], address, extra={"event": "node_joined", "node": batch["node"]})
+        # Duplikate (z. B. nach verlorener Bestätigung) werden erneut bestätigt, aber nicht gezählt
+        if node.is_duplicate(batch["seq"]):
+            self.stats["duplicates"] += 1
+        else:
+            node.ingest(batch, address, time.time())
+            self.stats["batches"] += 1
+        return batch["seq"]
+
+    async def _handle_tcp(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        address = f"tcp:{peer[0]}:{peer[1]}" if peer else "tcp"
+        task = asyncio.current_task()
+        self._clients[task] = writer
+        self.stats["connections"] += 1
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                (length,) = FRAME_HEADER.unpack(header)
+                if length > MAX_FRAME_BYTES:
+                    logger.warning("Zu großes Telemetrie-Bündel von %s (%d Byte).", address, length)
+                    self.stats["rejected"] += 1
+                    break
+                seq = self.ingest(await reader.readexactly(length), address)
+                if seq is None:
+                    break
+                writer.write(ACK.pack(seq))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.pop(task, None)
+            self.stats["connections"] -= 1
+            writer.close()
+
+    async def start(self):
+        """Öffnet TCP- und UDP-Port; gibt die tatsächlich gebundenen Ports zurück (Port 0 = frei wählen)."""
+        loop = asyncio.get_running_loop()
+        tcp_server = await asyncio.start_server(self._handle_tcp, self.host, self.port)
+        tcp_port = tcp_server.sockets[0].getsockname()[1]
+        udp_transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self),
+                                                               local_addr=(self.host, self.port or tcp_port))
+        self._servers = [tcp_server, udp_transport]
+        udp_port = udp_transport.get_extra_info("sockname")[1]
+        logger.info("Telemetrie-Sammler lauscht auf %s (TCP %d, UDP %d).", self.host, tcp_port, udp_port)
+        return tcp_port, udp_port
+
+    async def stop(self):
+        """Schließt die Ports und alle offenen Verbindungen; Exporter bauen sie beim nächsten Senden neu auf."""
+        for server in self._servers:
+            server.close()
+        # Verbindungen schließen statt die Tasks abzubrechen: readexactly() endet dann
+        # regulär, und die Handler beenden sich ohne CancelledError
+        clients = list(self._clients.items())
+        for _, writer in clients:
+            writer.close()
+        await asyncio.gather(*(task for task, _ in clients), return_exceptions=True)
+        if self._servers:
+            await self._servers[0].wait_closed()
+        self._servers = []
+        self.dump()
+
+    async def run(self, dump_interval_s=ROLLUP_DUMP_INTERVAL_S):
+        await self.start()
+        try:
+            while True:
+                await asyncio.sleep(dump_interval_s)
+                self.dump()
+        finally:
+            await self.stop()
+
+    def snapshot(self):
+        return {"stats": dict(self.stats), "nodes": {node_id: node.summary() for node_id, node in sorted(self.nodes.items())}}
+
+    def dump(self):
+        if not self.rollup_file:
+            return
+        try:
+            tmp_path = self.rollup_file + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(tmp_path, self.rollup_file)
+        except OSError as e:
+            logger.error("Fehler beim Schreiben von '%s': %s", self.rollup_file, e, extra={"rate_limit_s": 60})
+
+
+# --- Lokale Simulation ---
+async def simulate(node_count, rounds, protocol, readings_per_batch=60, outage=False, spool_root="telemetry_sim"):
+    """
+    Startet einen Sammler auf Loopback und lässt `node_count` simulierte
+    Knoten (je ein Exporter in einem Thread) Daten senden. Mit outage=True
+    ist der Sammler bei der ersten Runde noch nicht erreichbar, die Knoten
+    müssen also spoolen und später nachsenden.
+    """
+    # Freien Port ermitteln, damit der Ausfall vor dem Start simuliert werden kann
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    protocols = ("tcp", "udp") if protocol == "both" else (protocol,)
+    exporters = [TelemetryExporter(f"sim-{index:03d}", "127.0.0.1", port, protocols[index % len(protocols)],
+                                   spool_dir=os.path.join(spool_root, f"sim-{index:03d}"), timeout_s=1.0)
+                 for index in range(node_count)]
+
+    def produce(exporter, round_index):
+        base = time.time()
+        for index in range(readings_per_batch):
+            exporter.add_reading(base + index, 40 + (index + round_index) % 20, 90 - round_index)
+        exporter.add_watering(base, 20, "auto")
+        exporter.add_status(base, {"pump_queue": 0}, {})
+
+    async def flush_all():
+        await asyncio.gather(*(asyncio.to_thread(exporter.flush) for exporter in exporters))
+
+    collector = TelemetryCollector("127.0.0.1", port, rollup_file=None)
+    collector_running = False
+    started = time.perf_counter()
+    for round_index in range(rounds):
+        if not collector_running and (round_index > 0 or not outage):
+            await collector.start()
+            collector_running = True
+        for exporter in exporters:
+            produce(exporter, round_index)
+        await flush_all()
+    if not collector_running:
+        await collector.start()
+        await flush_all()
+    elapsed = time.perf_counter() - started
+    for exporter in exporters:
+        exporter.close()
+    await collector.stop()
+
+    snapshot = collector.snapshot()
+    snapshot["simulation"] = {
+        "nodes": node_count,
+        "rounds": rounds,
+        "protocols": list(protocols),
+        "wall_time_s": round(elapsed, 3),
+        "records_expected": node_count * rounds * (readings_per_batch + 2),
+        "records_received": sum(node.records for node in collector.nodes.values()),
+        "spooled_batches": sum(exporter.stats["spooled_batches"] for exporter in exporters),
+        "left_in_spool": sum(exporter.spool_size() for exporter in exporters)
+    }
+    return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telemetrie-Sammler und lokale Simulation")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    collect = subparsers.add_parser("collect", help="Sammler starten")
+    collect.add_argument("--host", default="0.0.0.0")
+    collect.add_argument("--port", type=int, default=TELEMETRY_PORT)
+    collect.add_argument("--rollup-file", default=ROLLUP_FILE)
+    sim = subparsers.add_parser("simulate", help="Mehrere Knoten auf Loopback simulieren")
+    sim.add_argument("--nodes", type=int, default=10)
+    sim.add_argument("--rounds", type=int, default=3)
+    sim.add_argument("--protocol", choices=("tcp", "udp", "both"), default="both")
+    sim.add_argument("--outage", action="store_true", help="Sammler erst nach der ersten Runde starten")
+    sim.add_argument("--spool-dir", default="telemetry_sim")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+    if args.command == "collect":
+        try:
+            asyncio.run(TelemetryCollector(args.host, args.port, args.rollup_file).run())
+        except KeyboardInterrupt:
+            pass
+    else:
+        result = asyncio.run(simulate(args.nodes, args.rounds, args.protocol, outage=args.outage, spool_root=args.spool_dir))
+        for key, value in result["simulation"].items():
+            print(f"{key}: {value}")
+        print(f"collector: {result['stats']}")
@@ -0,0 +1,288 @@
+import argparse
+import logging
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from pi_hardware_utils import (ADS1115, Pump, RotaryEncoder, PreWateringCheck, ADS_CHANNEL_MUX,
+                               ADS_DEFAULT_GAIN, ADS_DEFAULT_DATA_RATE, TANK_VOLUME)
+
+logger = logging.getLogger(__name__)
+
+# --- Trace-Format ---
+# Kopf:      Magic, Version, Startzeit (Unix-Zeit)
+# Datensatz: Millisekunden seit Start, Art, Schlüssel, Wert (14 Byte; Version 1
+#            hatte einen 32-Bit-Zeitstempel, der nach 49,7 Tagen überlief)
+#   ADC:  Schlüssel = Board-Index * 8 + Kanal-Index, Wert = Rohwert
+#   GPIO: Schlüssel = Pin, Wert = gelesener Pegel
+#   PUMP: Schlüssel = Pin, Wert = 1 (an) / 0 (aus)
+TRACE_MAGIC = b"PPTR"
+TRACE_VERSION = 2
+TRACE_HEADER = struct.Struct("<4sBd")
+TRACE_RECORD = struct.Struct("<QBBi")
+TRACE_RECORD_FORMATS = {1: struct.Struct("<IBBi"), 2: TRACE_RECORD}  # Lesbare Versionen
+KIND_ADC = 1
+KIND_GPIO = 2
+KIND_PUMP = 3
+CHANNEL_IDS = {name: index for index, name in enumerate(ADS_CHANNEL_MUX)}
+CHANNEL_NAMES = {index: name for name, index in CHANNEL_IDS.items()}
+TRACE_BUFFER_BYTES = 4096  # Puffergröße, ab der in die Datei geschrieben wird
+
+TraceRecord = namedtuple("TraceRecord", "time_s kind key value")
+
+
+class TraceRecorder:
+    """
+    Zeichnet Sensorwerte, GPIO-Flanken und Pumpenschaltungen in eine kompakte
+    Binärdatei auf. Die Datensätze werden gepuffert und blockweise geschrieben.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.record_count = 0
+        self.dropped_count = 0
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._start = time.monotonic()
+        self._file = open(path, 'wb')
+        self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, time.time()))
+        logger.info("Trace-Aufzeichnung nach '%s' gestartet.", path)
+
+    def _record(self, kind, key, value):
+        """
+        Hängt einen Datensatz an. Wird aus Sensor- und Pumpenaufrufen heraus
+        aufgerufen und darf daher nie eine Ausnahme werfen.
+        """
+        elapsed_ms = int((time.monotonic() - self._start) * 1000)
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._buffer += TRACE_RECORD.pack(elapsed_ms, kind, key, int(value))
+                self.record_count += 1
+                if len(self._buffer) >= TRACE_BUFFER_BYTES:
+                    self._flush_locked()
+            except (struct.error, ValueError, TypeError, OSError) as e:
+                self.dropped_count += 1
+                logger.error("Trace-Datensatz konnte nicht geschrieben werden: %s", e, extra={"rate_limit_s": 300})
+
+    def record_adc(self, channel_name, value, board_index=0):
+        self._record(KIND_ADC, board_index * 8 + CHANNEL_IDS[channel_name], value)
+
+    def record_gpio(self, pin, level):
+        self._record(KIND_GPIO, pin, level)
+
+    def record_pump(self, pin, on):
+        self._record(KIND_PUMP, pin, 1 if on else 0)
+
+    def _flush_locked(self):
+        try:
+            self._file.write(self._buffer)
+            self._file.flush()
+        finally:
+            # Bei Schreibfehlern den Puffer verwerfen, statt ihn unbegrenzt wachsen zu lassen
+            self._buffer.clear()
+
+    def flush(self):
+        with self._lock:
+            if self._file:
+                try:
+                    self._flush_locked()
+                except OSError as e:
+                    logger.error("Trace konnte nicht geschrieben werden: %s", e, extra={"rate_limit_s": 300})
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._flush_locked()
+                self._file.close()
+            except OSError as e:
+                logger.error("Trace konnte nicht abgeschlossen werden: %s", e)
+            self._file = None
+        logger.info("Trace-Aufzeichnung beendet: %d Datensätze in '%s'.", self.record_count, self.path)
+
+
+def read_trace(path):
+    """
+    Liest eine Trace-Datei. Gibt (startzeit, [TraceRecord, ...]) zurück;
+    ein unvollständiger letzter Datensatz wird ignoriert.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, start_time = TRACE_HEADER.unpack_from(data)
+    if magic != TRACE_MAGIC or version not in TRACE_RECORD_FORMATS:
+        raise ValueError(f"'{path}' ist keine Trace-Datei (Version {', '.join(map(str, TRACE_RECORD_FORMATS))}).")
+    record_format = TRACE_RECORD_FORMATS[version]
+    body = memoryview(data)[TRACE_HEADER.size:]
+    body = body[:len(body) - len(body) % record_format.size]
+    records = [TraceRecord(ms / 1000, kind, key, value) for ms, kind, key, value in record_format.iter_unpack(body)]
+    return start_time, records
+
+
+# --- Replay-Backends ---
+class ReplayClock:
+    """Virtuelle Zeitbasis in Sekunden seit Trace-Beginn."""
+    def __init__(self):
+        self.now = 0.0
+
+
+class ReplayADS1115(ADS1115):
+    """
+    Liefert für jeden Kanal den zuletzt aufgezeichneten Wert (Sample-and-Hold)
+    statt über I2C zu lesen.
+    """
+    def __init__(self, board_count=1):
+        self.recorder = None
+        self.read_count = 0
+        self.boards = {index: None for index in range(board_count)}
+        self.ads = None
+        self.channel_settings = {channel: {"gain": ADS_DEFAULT_GAIN, "data_rate": ADS_DEFAULT_DATA_RATE}
+                                 for channel in ADS_CHANNEL_MUX}
+        self._ready_events = {}
+        self.values = {}  # Schlüssel wie im Trace -> Rohwert
+
+    def get_value(self, channel_name):
+        if channel_name not in CHANNEL_IDS:
+            logger.error("Ungültiger Kanal '%s'.", channel_name)
+            return -1
+        self.read_count += 1
+        return self.values.get(CHANNEL_IDS[channel_name], -1)
+
+    def scan(self, channels=None):
+        results = {}
+        for board_index in self.boards:
+            results[board_index] = {channel: self.values.get(board_index * 8 + CHANNEL_IDS[channel], -1)
+                                    for channel in channels or ADS_CHANNEL_MUX}
+            self.read_count += len(results[board_index])
+        return results
+
+
+class ReplayPump(Pump):
+    """
+    Pumpe ohne GPIO. Schaltvorgänge werden mit virtueller Zeit protokolliert,
+    Wartezeiten stellen nur die Zeitbasis weiter.
+    """
+    def __init__(self, clock, pumpPin=21, on_state_change=None):
+        self.clock = clock
+        self.pumpPin = pumpPin
+        self.running = False
+        self.on_state_change = on_state_change
+        self.recorder = None
+        self.scheduler = None
+        self.transitions = []  # (virtuelle_zeit, an)
+
+    def set_state(self, on):
+        self.transitions.append((round(self.clock.now, 3), on))
+        self._state_changed(on)
+
+    def _wait(self, duration_s):
+        self.clock.now += duration_s
+
+
+class ReplayRotaryEncoder(RotaryEncoder):
+    """Drehgeber ohne GPIO; Flanken werden mit virtueller Zeit ausgewertet."""
+    def __init__(self, menu_system_instance, clock, clockPin=5, dataPin=6, switchPin=13):
+        self.clock = clock
+        self.clockPin = clockPin
+        self.dataPin = dataPin
+        self.switchPin = switchPin
+        self.menu_system = menu_system_instance
+        self.recorder = None
+        self._locked_until = 0.0
+
+    def handle_clock_edge(self, data_level, now=None):
+        super().handle_clock_edge(data_level, self.clock.now if now is None else now)
+
+
+class ReplayResult:
+    """Ergebnis eines Replays für Regressionstests und Laufzeitvergleiche."""
+    def __init__(self, record_count, duration_s, wall_time_s, pump_transitions, recorded_pump_transitions, watering_cycles):
+        self.record_count = record_count
+        self.duration_s = duration_s
+        self.wall_time_s = wall_time_s
+        self.pump_transitions = pump_transitions
+        self.recorded_pump_transitions = recorded_pump_transitions
+        self.watering_cycles = watering_cycles
+
+    @property
+    def records_per_s(self):
+        return self.record_count / self.wall_time_s if self.wall_time_s > 0 else float("inf")
+
+    def summary(self):
+        return {
+            "records": self.record_count,
+            "trace_duration_s": round(self.duration_s, 3),
+            "wall_time_s": round(self.wall_time_s, 6),
+            "records_per_s": round(self.records_per_s),
+            "watering_cycles": self.watering_cycles,
+            "pump_transitions": len(self.pump_transitions),
+            "recorded_pump_transitions": len(self.recorded_pump_transitions)
+        }
+
+
+class TraceReplay:
+    """
+    Spielt einen Trace deterministisch und ohne Wartezeiten ab: Sensorwerte
+    werden in ein ReplayADS1115 eingespeist, GPIO-Flanken an die Menülogik
+    weitergegeben und die automatische Bewässerung wird in virtueller Zeit
+    im angegebenen Intervall ausgelöst.
+    """
+    def __init__(self, path):
+        self.start_time, self.records = read_trace(path)
+
+    def run(self, menu_system=None, watering_interval_s=None, watering_amount_ml=20, moisture_max=50,
+            moisture_sensor_use=1, pump_pin=21, encoder_pins=(5, 6, 13)):
+        # Späte Importe: plant_watering_system importiert seinerseits dieses Modul
+        import plant_watering_system as system
+
+        clock = ReplayClock()
+        board_count = max((record.key // 8 for record in self.records if record.kind == KIND_ADC), default=0) + 1
+        ads = ReplayADS1115(board_count)
+        pump = ReplayPump(clock, pump_pin)
+        control = system.WateringControl(pump, PreWateringCheck(ads))
+        encoder = ReplayRotaryEncoder(menu_system, clock, *encoder_pins) if menu_system else None
+        clock_pin, _, switch_pin = encoder_pins
+        system.watering_status["remaining_watering_cycles"] = int(TANK_VOLUME / watering_amount_ml)
+
+        recorded_pump = []
+        watering_cycles = 0
+        next_deadline = watering_interval_s if watering_interval_s else None
+        started = time.perf_counter()
+        for record in self.records:
+            while next_deadline is not None and next_deadline <= record.time_s:
+                clock.now = max(clock.now, next_deadline)
+                if control.run_watering_cycle(watering_amount_ml, moisture_max, moisture_sensor_use):
+                    watering_cycles += 1
+                next_deadline += watering_interval_s
+            clock.now = max(clock.now, record.time_s)
+
+            if record.kind == KIND_ADC:
+                ads.values[record.key] = record.value
+            elif record.kind == KIND_GPIO and encoder:
+                if record.key == clock_pin:
+                    encoder.handle_clock_edge(record.value)
+                elif record.key == switch_pin:
+                    encoder.handle_switch_edge(record.value)
+            elif record.kind == KIND_PUMP and record.key == pump_pin:
+                recorded_pump.append((record.time_s, bool(record.value)))
+        wall_time = time.perf_counter() - started
+
+        duration = self.records[-1].time_s if self.records else 0.0
+        return ReplayResult(len(self.records), duration, wall_time, pump.transitions, recorded_pump, watering_cycles)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trace-Dateien anzeigen und abspielen")
+    parser.add_argument("trace", help="Trace-Datei")
+    parser.add_argument("--interval", type=float, help="Gießintervall in Sekunden für das Replay der Automatik")
+    parser.add_argument("--amount", type=float, default=20, help="Gießmenge in ml")
+    parser.add_argument("--moisture-max", type=int, default=50, help="Feuchtigkeitsschwelle in %%")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = TraceReplay(args.trace).run(watering_interval_s=args.interval, watering_amount_ml=args.amount,
+                                         moisture_max=args.moisture_max)
+    for key, value in result.summary().items():
+        print(f"{key}: {value}")
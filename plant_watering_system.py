@@ -3,22 +3,39 @@ import time
 import threading
 import sys
 import os
+import logging
+import argparse
+import asyncio
+import socket
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 # Importiere die Hardware-Utilities
 try:
     # WICHTIG: Stellen Sie sicher, dass pi_hardware_utils.py die neue Methode
     # pump_for_duration(self, duration_s) in der Pump-Klasse enthält.
-    from pi_hardware_utils import ADS1115, Pump, PreWateringCheck, TANK_VOLUME
+    from pi_hardware_utils import ADS1115, AdaptiveSampler, Pump, PumpDutyScheduler, PreWateringCheck, TANK_VOLUME, PUMP_TIME_ONE_ML
+    from plant_history import HistoryStore
+    from plant_anomaly import AnomalyDetector
+    from plant_commands import dequeue_command, report_command_result, cleanup_command_results
+    from plant_logging import setup_logging, RECENT_EVENTS_FILE
+    from plant_trace import TraceRecorder
+    from plant_telemetry import TelemetryExporter, TELEMETRY_PORT, TELEMETRY_FLUSH_INTERVAL_S
 except ImportError:
-    print("Fehler: 'pi_hardware_utils.py' konnte nicht gefunden werden.")
-    print("Bitte stellen Sie sicher, dass 'pi_hardware_utils.py' im selben Verzeichnis liegt.")
+    logger.critical("Fehler: Ein Modul des Bewässerungssystems (pi_hardware_utils, plant_history, plant_anomaly, plant_commands, plant_logging, plant_trace, plant_telemetry) konnte nicht gefunden werden.")
+    logger.critical("Bitte stellen Sie sicher, dass alle Dateien im selben Verzeichnis liegen.")
     sys.exit(1)
 
 # --- Globale Konfiguration und Statusdateien ---
 CONFIG_FILE = 'config.json'
 PUMP_COMMAND_FILE = 'pump_command.json'
 WATERING_STATUS_FILE = 'watering_status.json'
+COMMAND_POLL_INTERVAL_S = 0.5  # Abfrageintervall der Befehlsdatei
+STATUS_SAVE_INTERVAL_S = 5.0  # Abstand, in dem die asyncio-Laufzeit den Status speichert
+LATENCY_PROBE_INTERVAL_S = 0.1  # Messintervall der Event-Loop-Latenz
+HOUSEKEEPING_INTERVAL_S = 600.0  # Abstand der Aufräumarbeiten (Verlauf, alte Befehlsergebnisse)
 
 # Standardwerte für die Pflanzenbewässerung
 DEFAULT_CONFIG = {
@@ -38,7 +55,10 @@ watering_status = {
     "last_watering_time": None,
     "estimated_next_watering_time": None,
     "remaining_watering_cycles": 0,
-    "current_timer_remaining_s": 0
+    "current_timer_remaining_s": 0,
+    "pump_running": False,
+    "metrics": {},
+    "anomalies": {}
 }
 
 # --- Funktionen zum Laden/Speichern ---
@@ -53,7 +73,7 @@ def load_config_for_system():
             moisturemax = config.get("moisturemax", DEFAULT_CONFIG["moisturemax"])
             moisturesensoruse = config.get("moisturesensoruse", DEFAULT_CONFIG["moisturesensoruse"])
     except (FileNotFoundError, json.JSONDecodeError, IndexError):
-        print(f"Warnung: '{CONFIG_FILE}' nicht gefunden oder fehlerhaft. Verwende Standardwerte.")
+        logger.warning("'%s' nicht gefunden oder fehlerhaft. Verwende Standardwerte.", CONFIG_FILE, extra={"rate_limit_s": 3600})
 
 def load_watering_status():
     """Lädt den Bewässerungsstatus."""
@@ -64,9 +84,9 @@ def load_watering_status():
             for key in watering_status:
                 if key in data:
                     watering_status[key] = data[key]
-            print("Bewässerungsstatus erfolgreich geladen.")
+            logger.info("Bewässerungsstatus erfolgreich geladen.")
     except (FileNotFoundError, json.JSONDecodeError, ValueError):
-        print(f"Warnung: '{WATERING_STATUS_FILE}' nicht gefunden. Initialisiere Status.")
+        logger.warning("'%s' nicht gefunden. Initialisiere Status.", WATERING_STATUS_FILE)
         initialize_watering_status()
 
 def save_watering_status():
@@ -75,16 +95,43 @@ def save_watering_status():
         with open(WATERING_STATUS_FILE, 'w') as f:
             json.dump(watering_status, f, indent=4)
     except Exception as e:
-        print(f"Fehler beim Speichern des Bewässerungsstatus: {e}")
+        logger.error("Fehler beim Speichern des Bewässerungsstatus: %s", e, extra={"rate_limit_s": 60})
+
+def on_pump_state_change(running):
+    """Schreibt den Pumpenzustand in den Status, damit die UI ihre Abtastrate anpassen kann."""
+    watering_status["pump_running"] = running
+    save_watering_status()
 
 def initialize_pump_command_file():
     """Stellt sicher, dass die Befehlsdatei existiert und leer ist."""
     try:
         with open(PUMP_COMMAND_FILE, 'w') as f:
             json.dump({"action": "none"}, f)
-        print(f"'{PUMP_COMMAND_FILE}' initialisiert.")
+        logger.info("'%s' initialisiert.", PUMP_COMMAND_FILE)
     except Exception as e:
-        print(f"Fehler beim Initialisieren von '{PUMP_COMMAND_FILE}': {e}")
+        logger.error("Fehler beim Initialisieren von '%s': %s", PUMP_COMMAND_FILE, e)
+
+def read_pump_command():
+    """
+    Liest den nächsten Befehl: zuerst aus der Warteschlange (plant_commands),
+    sonst aus der pump_command.json, die dabei zurückgesetzt wird. Gibt None
+    zurück, wenn kein Befehl vorliegt.
+    """
+    command = dequeue_command()
+    if command:
+        return command
+    try:
+        with open(PUMP_COMMAND_FILE, 'r') as f:
+            command = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if command.get("action", "none") == "none":
+        return None
+
+    # Befehl gefunden, sofort zur Verarbeitung zurücksetzen
+    with open(PUMP_COMMAND_FILE, 'w') as f:
+        json.dump({"action": "none"}, f)
+    return command
 
 def initialize_watering_status():
     """Initialisiert den Bewässerungsstatus."""
@@ -98,22 +145,43 @@ def initialize_watering_status():
     watering_status["estimated_next_watering_time"] = time.time() + wateringtimer
     watering_status["current_timer_remaining_s"] = wateringtimer
     save_watering_status()
-    print("Bewässerungsstatus initialisiert.")
+    logger.info("Bewässerungsstatus initialisiert.")
 
 class WateringControl:
     """Hauptsteuerung für die Bewässerung."""
-    def __init__(self, pump_instance, precheck_instance):
+    def __init__(self, pump_instance, precheck_instance, history=None, detector=None, telemetry=None):
         self._timer_thread = None
         self._stop_thread = False
         self.pump = pump_instance
         self.prewatercheck = precheck_instance
+        self.history = history
+        self.detector = detector
+        self.telemetry = telemetry
+
+    def record_watering(self, amount_ml, source="manual"):
+        """Vermerkt eine Bewässerung im Verlauf und in der Telemetrie."""
+        now = time.time()
+        if self.history:
+            self.history.append_event(now, amount_ml)
+        if self.telemetry:
+            self.telemetry.add_watering(now, amount_ml, source)
+
+    def housekeeping(self):
+        """
+        Regelmäßige Aufräumarbeiten. Das Hauptsystem ist der einzige Prozess,
+        der den Verlauf bereinigt; nie abgeholte Befehlsergebnisse (ohne --wait)
+        würden sich sonst im Befehlsverzeichnis ansammeln.
+        """
+        if self.history:
+            self.history.compact_if_due()
+        cleanup_command_results()
 
     def run_timer_loop(self):
         """Hauptschleife für die automatische Bewässerung."""
         global wateringtimer, wateringamount, moisturemax, moisturesensoruse, watering_status
         load_config_for_system()
         current_timer = wateringtimer
-        print(f"Automatischer Bewässerungs-Timer gestartet ({current_timer}s).")
+        logger.info("Automatischer Bewässerungs-Timer gestartet (%ss).", current_timer)
         while current_timer >= 0 and not self._stop_thread:
             watering_status["current_timer_remaining_s"] = current_timer
             save_watering_status()
@@ -122,65 +190,111 @@ class WateringControl:
             current_timer -= 1
 
         if not self._stop_thread:
-            print("Timer abgelaufen. Prüfe Bedingungen für automatische Bewässerung.")
-            if watering_status["remaining_watering_cycles"] > 0:
-                if self.prewatercheck.water_tank(wateringamount) and \
-                        self.prewatercheck.moisture_sensor(moisturemax, moisturesensoruse):
-                    print("Vorabprüfungen bestanden. Starte automatischen Pumpenbetrieb.")
-                    self.pump.pump_timer(wateringamount)
-                    watering_status["last_watering_time"] = time.time()
-                    watering_status["remaining_watering_cycles"] -= 1
-                    print(f"Verbleibende Gießzyklen: {watering_status['remaining_watering_cycles']}")
-                else:
-                    print("Bedingungen nicht erfüllt. Automatische Bewässerung übersprungen.")
-            else:
-                print("Keine Gießzyklen mehr verfügbar (Tank leer).")
+            self.run_watering_cycle(wateringamount, moisturemax, moisturesensoruse)
 
             watering_status["estimated_next_watering_time"] = time.time() + wateringtimer
             save_watering_status()
             self.run_timer_loop()
         else:
-            print("Automatisches Bewässerungsprogramm gestoppt.")
+            logger.info("Automatisches Bewässerungsprogramm gestoppt.")
+
+    def run_watering_cycle(self, amount_ml, moisture_max, moisture_sensor_use):
+        """
+        Prüft die Bedingungen für eine automatische Bewässerung und gießt gegebenenfalls.
+        Gibt True zurück, wenn gegossen wurde.
+        """
+        if self.watering_blocked(moisture_sensor_use) or \
+                not self.check_watering_conditions(amount_ml, moisture_max, moisture_sensor_use):
+            return False
+        self.pump.pump_timer(amount_ml)
+        self.complete_automatic_watering(amount_ml)
+        return True
+
+    def watering_blocked(self, moisture_sensor_use):
+        """Blockiert die automatische Bewässerung, solange die Sensordaten unzuverlässig sind."""
+        if not self.detector:
+            return False
+        reasons = self.detector.blocking_reasons(moisture_sensor_use)
+        if reasons:
+            logger.warning("Automatische Bewässerung blockiert, Sensordaten unzuverlässig: %s", "; ".join(reasons),
+                           extra={"event": "watering_blocked"})
+        return bool(reasons)
+
+    def check_watering_conditions(self, amount_ml, moisture_max, moisture_sensor_use):
+        """Vorabprüfungen der automatischen Bewässerung (liest die Sensoren)."""
+        logger.info("Timer abgelaufen. Prüfe Bedingungen für automatische Bewässerung.")
+        if watering_status["remaining_watering_cycles"] <= 0:
+            logger.warning("Keine Gießzyklen mehr verfügbar (Tank leer).")
+            return False
+        if not (self.prewatercheck.water_tank(amount_ml) and
+                self.prewatercheck.moisture_sensor(moisture_max, moisture_sensor_use)):
+            logger.info("Bedingungen nicht erfüllt. Automatische Bewässerung übersprungen.")
+            return False
+        logger.info("Vorabprüfungen bestanden. Starte automatischen Pumpenbetrieb.")
+        return True
+
+    def complete_automatic_watering(self, amount_ml):
+        """Aktualisiert Verlauf und Status nach einer automatischen Bewässerung."""
+        self.record_watering(amount_ml, "auto")
+        watering_status["last_watering_time"] = time.time()
+        watering_status["remaining_watering_cycles"] -= 1
+        logger.info("Verbleibende Gießzyklen: %d", watering_status["remaining_watering_cycles"],
+                    extra={"event": "watering", "source": "auto", "amount_ml": amount_ml})
+        return True
 
     def process_manual_pump_commands(self):
-        """Überprüft und verarbeitet Befehle aus der pump_command.json."""
+        """Überprüft und verarbeitet Befehle aus der Warteschlange und der pump_command.json."""
         try:
-            with open(PUMP_COMMAND_FILE, 'r') as f:
-                command = json.load(f)
-
-            action = command.get("action")
-            if action == "none":
+            command = read_pump_command()
+            if command is None:
                 return
 
-            # Befehl gefunden, sofort zur Verarbeitung zurücksetzen
-            with open(PUMP_COMMAND_FILE, 'w') as f:
-                json.dump({"action": "none"}, f)
-
+            action = command.get("action")
             if action == "pump_manual":
                 amount_ml = command.get("amount_ml", 0)
                 if amount_ml > 0:
-                    print(f"Manueller Pumpenbefehl empfangen: {amount_ml} ml.")
+                    logger.info("Manueller Pumpenbefehl empfangen: %s ml.", amount_ml)
                     self.pump.pump_timer(amount_ml)
-                print("Manueller Pumpenbefehl ausgeführt.")
+                    self.record_watering(amount_ml)
+                    report_command_result(command, "done")
+                else:
+                    report_command_result(command, "rejected", reason="amount_ml muss größer als 0 sein")
+                logger.info("Manueller Pumpenbefehl ausgeführt.", extra={"event": "watering", "source": "manual", "amount_ml": amount_ml})
 
             elif action == "pump_timed": # NEU: Zeitgesteuerter Pumpenbefehl
                 duration_s = command.get("duration_s", 0)
                 if duration_s > 0:
-                    print(f"Zeitgesteuerter Pumpenbefehl empfangen: {duration_s} s.")
+                    logger.info("Zeitgesteuerter Pumpenbefehl empfangen: %s s.", duration_s)
                     # Führe die Pumpenaktion in einem eigenen Thread aus,
                     # um den Hauptthread nicht zu blockieren.
-                    threading.Thread(target=self.pump.pump_for_duration, args=(duration_s,), daemon=True).start()
-                print("Zeitgesteuerter Pumpenbefehl ausgeführt.")
+                    threading.Thread(target=self._run_timed_command, args=(command, duration_s), daemon=True).start()
+                    self.record_watering(round(duration_s / PUMP_TIME_ONE_ML, 1), "timed")
+                else:
+                    report_command_result(command, "rejected", reason="duration_s muss größer als 0 sein")
+                logger.info("Zeitgesteuerter Pumpenbefehl ausgeführt.")
 
             elif action == "repot_reset":
-                print("Umtopf-Reset-Befehl empfangen. Initialisiere Gießstatus.")
+                logger.info("Umtopf-Reset-Befehl empfangen. Initialisiere Gießstatus.")
                 initialize_watering_status()
-                print("Umtopf-Reset ausgeführt.")
+                if self.detector:
+                    self.detector.reset()
+                report_command_result(command, "done")
+                logger.info("Umtopf-Reset ausgeführt.", extra={"event": "repot_reset"})
+
+            else:
+                report_command_result(command, "rejected", reason=f"unbekannte Aktion '{action}'")
 
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
         except Exception as e:
-            print(f"Unerwarteter Fehler bei der Befehlsverarbeitung: {e}")
+            logger.error("Unerwarteter Fehler bei der Befehlsverarbeitung: %s", e, extra={"rate_limit_s": 60})
+
+    def _run_timed_command(self, command, duration_s):
+        try:
+            self.pump.pump_for_duration(duration_s)
+        except Exception as e:
+            logger.error("Fehler beim zeitgesteuerten Pumpen: %s", e)
+            report_command_result(command, "failed", reason=str(e))
+        else:
+            report_command_result(command, "done")
 
     def start(self):
         """Startet das automatische Bewässerungsprogramm."""
@@ -189,46 +303,479 @@ class WateringControl:
             self._stop_thread = False
             if watering_status.get("last_watering_time") is None:
                 initialize_watering_status()
-            print("Starte automatisches Bewässerungsprogramm...")
+            logger.info("Starte automatisches Bewässerungsprogramm...")
             self._timer_thread = threading.Thread(target=self.run_timer_loop, daemon=True)
             self._timer_thread.start()
         else:
-            print("Timer ist auf 0 gesetzt. Automatikmodus startet nicht.")
+            logger.warning("Timer ist auf 0 gesetzt. Automatikmodus startet nicht.")
 
     def stop(self):
         """Stoppt das automatische Bewässerungsprogramm."""
         if self._timer_thread and self._timer_thread.is_alive():
-            print("Stoppe automatisches Bewässerungsprogramm...")
+            logger.info("Stoppe automatisches Bewässerungsprogramm...")
             self._stop_thread = True
 
+async def wait_with_timeout(awaitable, timeout):
+    """
+    Wartet höchstens `timeout` Sekunden auf `awaitable` und gibt den Task
+    zurück; ist er nicht fertig, wird er abgebrochen. Ersetzt asyncio.wait_for,
+    das unter Python < 3.12 einen Abbruch der aufrufenden Task verschlucken
+    kann, wenn das Ergebnis im selben Moment eintrifft.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        await asyncio.wait((task,), timeout=timeout)
+    finally:
+        if not task.done():
+            task.cancel()
+    return task
+
+
+class PumpJob:
+    """Ein Pumpenlauf in der Warteschlange der asyncio-Laufzeit."""
+    def __init__(self, duration_s, amount_ml, source, command=None):
+        self.duration_s = duration_s
+        self.amount_ml = amount_ml
+        self.source = source
+        self.command = command  # Auslösender Befehl aus der Warteschlange, falls vorhanden
+        self.done = asyncio.get_running_loop().create_future()
+        self.pulses = [duration_s]  # Noch ausstehende Pulse in Sekunden
+        self.pulse_count = 1
+        self.not_before = 0.0  # Ende der Sickerpause nach dem letzten Puls
+        self.started = False
+
+class AsyncWateringRuntime:
+    """
+    Führt Sensorik, Zeitplanung, Pumpensteuerung und Befehlsverarbeitung als
+    kooperierende Tasks auf einer Event-Loop aus. Globale Zustände wie
+    watering_status werden nur noch im Loop-Thread verändert. Blockierende
+    I2C-/GPIO-Aufrufe laufen in einem Executor mit genau einem Thread, der
+    damit auch den Buszugriff serialisiert.
+    """
+    def __init__(self, control, ads_instance):
+        self.control = control
+        self.ads1115 = ads_instance
+        self.sampler = AdaptiveSampler()
+        self.latest_readings = {"moisture": None, "tank_percent": None, "time": None}
+        self.loop_latency = {"last_ms": 0.0, "max_ms": 0.0, "mean_ms": 0.0, "probes": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hardware")
+        self._pump_jobs = None
+        self._pending_jobs = []
+        self._activity = None
+        self._reschedule = None
+        self._stopping = None
+
+    async def _hardware(self, func, *args):
+        """Führt einen blockierenden Hardwarezugriff im Executor aus."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def run(self):
+        """Startet alle Tasks und läuft bis stop() aufgerufen oder die Loop abgebrochen wird."""
+        self._pump_jobs = asyncio.Queue()
+        self._activity = asyncio.Event()
+        self._reschedule = asyncio.Event()
+        self._stopping = asyncio.Event()
+        tasks = [
+            asyncio.create_task(self._sensing_task(), name="sensing"),
+            asyncio.create_task(self._scheduler_task(), name="scheduler"),
+            asyncio.create_task(self._pump_task(), name="pump"),
+            asyncio.create_task(self._command_task(), name="commands"),
+            asyncio.create_task(self._latency_task(), name="latency"),
+            asyncio.create_task(self._housekeeping_task(), name="housekeeping")
+        ]
+        if self.control.telemetry:
+            tasks.append(asyncio.create_task(self._telemetry_task(), name="telemetry"))
+        logger.info("asyncio-Laufzeit gestartet.")
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        try:
+            # Überwachung: Endet eine Task unerwartet, wird die Laufzeit beendet,
+            # statt ohne Pumpe oder Zeitplanung weiterzulaufen
+            done, _ = await asyncio.wait(tasks + [stopping], return_when=asyncio.FIRST_COMPLETED)
+            failed = [task for task in done if task is not stopping]
+            for task in failed:
+                error = None if task.cancelled() else task.exception()
+                logger.critical("Task '%s' unerwartet beendet: %s", task.get_name(),
+                                "abgebrochen" if task.cancelled() else repr(error),
+                                exc_info=(type(error), error, error.__traceback__) if error else None)
+            if failed:
+                raise RuntimeError(f"Task '{failed[0].get_name()}' der asyncio-Laufzeit ist ausgefallen.")
+        finally:
+            stopping.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for job in list(self._pending_jobs):
+                self._finish_job(job, False)
+            try:
+                if self.control.pump.running:
+                    await self._hardware(self.control.pump.set_state, False)
+            except Exception as e:
+                logger.critical("Pumpe konnte beim Beenden nicht abgeschaltet werden: %s", e)
+            self._executor.shutdown(wait=True)
+            watering_status["pump_running"] = False
+            save_watering_status()
+            if self.control.telemetry:
+                # Letzte Daten senden oder spoolen, damit beim Beenden nichts verloren geht
+                self.control.telemetry.flush()
+                self.control.telemetry.close()
+            logger.info("asyncio-Laufzeit beendet.")
+
+    def stop(self):
+        if self._stopping:
+            self._stopping.set()
+
+    async def _wait_for_activity(self, timeout):
+        """Wartet höchstens `timeout` Sekunden oder bis sich der Pumpenzustand ändert."""
+        await wait_with_timeout(self._activity.wait(), timeout)
+        self._activity.clear()
+
+    def _read_sensors(self):
+        """
+        Liest Feuchtigkeit und Tankfüllstand in einem Scan (läuft im Executor).
+        Gibt (feuchte_%, tank_%, feuchte_roh, tank_roh) zurück oder None,
+        wenn ein Kanal fehlt oder nicht gelesen werden konnte (-1).
+        """
+        results = self.ads1115.scan(["P0", "P1"])
+        values = next(iter(results.values()), {})
+        if values.get("P0", -1) == -1 or values.get("P1", -1) == -1:
+            return None
+        return (ADS1115.raw_to_percent(values["P0"]), ADS1115.raw_to_percent(values["P1"]),
+                values["P0"], values["P1"])
+
+    async def _sensing_task(self):
+        while True:
+            now = time.time()
+            self.sampler.update(now, self.control.pump.running, watering_status.get("estimated_next_watering_time"))
+            try:
+                readings = await self._hardware(self._read_sensors)
+            except Exception as e:
+                logger.error("Fehler beim Lesen der Sensoren: %s", e, extra={"rate_limit_s": 60})
+                readings = None
+            if readings:
+                moisture, tank_percent, moisture_raw, tank_raw = readings
+                self.latest_readings = {"moisture": moisture, "tank_percent": tank_percent, "time": now}
+                self.sampler.mark_sampled(now)
+                if self.control.history:
+                    self.control.history.append_sample(now, moisture, tank_percent)
+                if self.control.telemetry:
+                    self.control.telemetry.add_reading(now, moisture, tank_percent)
+                if self.control.detector:
+                    self.control.detector.update(now, moisture, tank_percent, moisture_raw, tank_raw)
+                    watering_status["anomalies"] = dict(self.control.detector.anomalies)
+            await self._wait_for_activity(self.sampler.interval)
+
+    async def _scheduler_task(self):
+        load_config_for_system()
+        if watering_status.get("last_watering_time") is None:
+            initialize_watering_status()
+        while True:
+            if wateringtimer <= 0:
+                logger.warning("Timer ist auf 0 gesetzt. Automatikmodus startet nicht.")
+                await self._reschedule.wait()
+                self._reschedule.clear()
+                load_config_for_system()
+                continue
+
+            deadline = watering_status.get("estimated_next_watering_time") or 0
+            if deadline <= time.time():
+                deadline = time.time() + wateringtimer
+                watering_status["estimated_next_watering_time"] = deadline
+            logger.info("Nächste automatische Bewässerung in %ds.", deadline - time.time())
+
+            # Bis zur Fälligkeit warten; der Status wird dabei regelmäßig gespeichert
+            while (remaining := deadline - time.time()) > 0 and not self._reschedule.is_set():
+                watering_status["current_timer_remaining_s"] = int(remaining)
+                watering_status["metrics"] = self.metrics()
+                save_watering_status()
+                await wait_with_timeout(self._reschedule.wait(), min(remaining, STATUS_SAVE_INTERVAL_S))
+            if self._reschedule.is_set():
+                # Umtopf-Reset: Konfiguration und Zeitplan wurden neu gesetzt
+                self._reschedule.clear()
+                load_config_for_system()
+                continue
+
+            load_config_for_system()
+            amount_ml = wateringamount
+            if not self.control.watering_blocked(moisturesensoruse) and \
+                    await self._hardware(self.control.check_watering_conditions, amount_ml, moisturemax, moisturesensoruse):
+                job = self.submit_pump_job(amount_ml * PUMP_TIME_ONE_ML, amount_ml, "auto")
+                if await job.done:
+                    self.control.complete_automatic_watering(amount_ml)
+            watering_status["estimated_next_watering_time"] = time.time() + wateringtimer
+            save_watering_status()
+
+    def submit_pump_job(self, duration_s, amount_ml, source, command=None):
+        job = PumpJob(duration_s, amount_ml, source, command)
+        if self.control.pump.scheduler:
+            job.pulses = self.control.pump.scheduler.pulses(duration_s)
+            job.pulse_count = len(job.pulses)
+        self._pump_jobs.put_nowait(job)
+        return job
+
+    async def _set_pump(self, on):
+        await self._hardware(self.control.pump.set_state, on)
+        watering_status["pump_running"] = on
+        save_watering_status()
+        self._activity.set()
+
+    def _pulse_start(self, job, now):
+        start = max(now, job.not_before)
+        scheduler = self.control.pump.scheduler
+        if scheduler:
+            start = scheduler.earliest_start(self.control.pump.pumpPin, job.pulses[0], start)
+        return start
+
+    def _next_pulse(self, now):
+        """
+        Wählt den Auftrag, dessen nächster Puls am frühesten zulässig ist
+        (bei Gleichstand der ältere). Eine begonnene Gabe hat Vorrang, damit
+        in ihren Sickerpausen kein anderes Wasser auf dieselbe Pflanze kommt.
+        """
+        candidates = [job for job in self._pending_jobs if job.started] or self._pending_jobs
+        return min(((job, self._pulse_start(job, now)) for job in candidates), key=lambda item: item[1])
+
+    async def _pump_task(self):
+        """
+        Einziger Verbraucher der Pumpenwarteschlange: Läufe überlappen nie.
+        Mit Scheduler werden Gaben in Pulse geteilt und so gelegt, dass
+        Einschaltdauer, Abkühlzeit und Versorgungsbudget eingehalten werden.
+        """
+        while True:
+            if not self._pending_jobs:
+                self._pending_jobs.append(await self._pump_jobs.get())
+            while not self._pump_jobs.empty():
+                self._pending_jobs.append(self._pump_jobs.get_nowait())
+
+            job, start = self._next_pulse(time.time())
+            delay = start - time.time()
+            if delay > 0:
+                # Warten, aber bei einem neuen Auftrag neu planen
+                getter = await wait_with_timeout(self._pump_jobs.get(), delay)
+                if getter.done():
+                    self._pending_jobs.append(getter.result())
+                    continue
+
+            job.started = True
+            try:
+                if not await self._run_pulse(job):
+                    self._finish_job(job, False)
+                    continue
+                job.pulses.pop(0)
+                job.not_before = time.time() + (self.control.pump.scheduler.soak_s if self.control.pump.scheduler else 0)
+                if not job.pulses:
+                    self._finish_job(job, True)
+            except BaseException:
+                # Auch bei unerwarteten Fehlern oder Abbruch wird der Auftrag abgeschlossen,
+                # sonst warten Zeitplanung und CLI für immer
+                self._finish_job(job, False)
+                raise
+
+    def _finish_job(self, job, completed):
+        """Entfernt einen Auftrag, meldet sein Ergebnis und vermerkt die Bewässerung."""
+        if job in self._pending_jobs:
+            self._pending_jobs.remove(job)
+        if job.done.done():
+            return
+        job.done.set_result(completed)
+        try:
+            if completed and job.source != "auto":
+                self.control.record_watering(job.amount_ml, job.source)
+            if job.command:
+                report_command_result(job.command, "done" if completed else "failed", amount_ml=job.amount_ml)
+        except Exception as e:
+            logger.error("Fehler beim Abschließen des Pumpenauftrags: %s", e)
+
+    async def _run_pulse(self, job):
+        """Führt den nächsten Puls eines Auftrags aus. Gibt True zurück, wenn er vollständig lief."""
+        pulse_s = job.pulses[0]
+        pulse_index = job.pulse_count - len(job.pulses) + 1
+        amount_ml = job.amount_ml * pulse_s / job.duration_s
+        scheduler = self.control.pump.scheduler
+        pump_id = self.control.pump.pumpPin
+        logger.info("Pumpe startet für %.2f Sekunden (%s, Puls %d/%d).", pulse_s, job.source, pulse_index, job.pulse_count,
+                    extra={"event": "pump_start", "duration_s": pulse_s, "amount_ml": amount_ml, "source": job.source})
+        reserved = started_at = None
+        completed = False
+        detector = self.control.detector
+        try:
+            if scheduler:
+                reserved = scheduler.reserve(pump_id, pulse_s, time.time())
+                if reserved > time.time():
+                    await asyncio.sleep(reserved - time.time())
+            await self._set_pump(True)
+            started_at = time.time()
+            if detector and pulse_index == 1:
+                # Die Erkennung bewertet die ganze Gabe, sonst würde jeder Puls die
+                # Feuchte-Basislinie auf den schon gestiegenen Wert setzen
+                detector.pump_started(started_at, job.amount_ml / TANK_VOLUME * 100)
+            await asyncio.sleep(pulse_s)
+            completed = True
+        except Exception as e:
+            logger.error("Fehler beim Pumpenlauf: %s", e)
+        finally:
+            # Auch bei Abbruch der Loop die Pumpe abschalten; ein Fehler dabei darf die Task nicht beenden
+            try:
+                await self._set_pump(False)
+                logger.info("Pumpe gestoppt.", extra={"event": "pump_stop"})
+            except Exception as e:
+                completed = False
+                logger.critical("Pumpe konnte nicht abgeschaltet werden: %s", e, extra={"event": "pump_stop_failed"})
+            if reserved is not None:
+                scheduler.complete(pump_id, reserved, time.time() if started_at else reserved)
+            if detector and (not completed or pulse_index == job.pulse_count):
+                detector.pump_stopped(time.time())
+        return completed
+
+    async def _command_task(self):
+        while True:
+            try:
+                command = read_pump_command()
+                if command:
+                    self._dispatch_command(command)
+            except Exception as e:
+                logger.error("Unerwarteter Fehler bei der Befehlsverarbeitung: %s", e, extra={"rate_limit_s": 60})
+            await asyncio.sleep(COMMAND_POLL_INTERVAL_S)
+
+    def _dispatch_command(self, command):
+        action = command.get("action")
+        if action == "pump_manual":
+            amount_ml = command.get("amount_ml") or 0
+            if amount_ml > 0:
+                logger.info("Manueller Pumpenbefehl empfangen: %s ml.", amount_ml)
+                self.submit_pump_job(amount_ml * PUMP_TIME_ONE_ML, amount_ml, "manual", command)
+            else:
+                report_command_result(command, "rejected", reason="amount_ml muss größer als 0 sein")
+        elif action == "pump_timed":
+            duration_s = command.get("duration_s") or 0
+            if duration_s > 0:
+                logger.info("Zeitgesteuerter Pumpenbefehl empfangen: %s s.", duration_s)
+                self.submit_pump_job(duration_s, round(duration_s / PUMP_TIME_ONE_ML, 1), "timed", command)
+            else:
+                report_command_result(command, "rejected", reason="duration_s muss größer als 0 sein")
+        elif action == "repot_reset":
+            logger.info("Umtopf-Reset-Befehl empfangen. Initialisiere Gießstatus.")
+            initialize_watering_status()
+            if self.control.detector:
+                self.control.detector.reset()
+                watering_status["anomalies"] = {}
+            self._reschedule.set()
+            report_command_result(command, "done")
+            logger.info("Umtopf-Reset ausgeführt.", extra={"event": "repot_reset"})
+        else:
+            logger.warning("Unbekannter Befehl: %s", action)
+            report_command_result(command, "rejected", reason=f"unbekannte Aktion '{action}'")
+
+    async def _telemetry_task(self):
+        """Sendet die Telemetrie gebündelt; Netzwerk und Spool laufen im Standard-Executor, nicht im Hardware-Thread."""
+        telemetry = self.control.telemetry
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(TELEMETRY_FLUSH_INTERVAL_S)
+            telemetry.add_status(time.time(), self.metrics(), watering_status.get("anomalies") or {})
+            try:
+                await loop.run_in_executor(None, telemetry.flush)
+            except Exception as e:
+                logger.error("Fehler beim Senden der Telemetrie: %s", e, extra={"rate_limit_s": 300})
+
+    async def _housekeeping_task(self):
+        """Führt die Aufräumarbeiten im Standard-Executor aus, damit die Loop nicht blockiert."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.control.housekeeping)
+            except Exception as e:
+                logger.error("Fehler bei den Aufräumarbeiten: %s", e, extra={"rate_limit_s": 3600})
+            await asyncio.sleep(HOUSEKEEPING_INTERVAL_S)
+
+    async def _latency_task(self):
+        """Misst die Verzögerung der Event-Loop gegenüber dem geplanten Aufwachzeitpunkt."""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LATENCY_PROBE_INTERVAL_S
+            await asyncio.sleep(LATENCY_PROBE_INTERVAL_S)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            stats = self.loop_latency
+            stats["probes"] += 1
+            stats["last_ms"] = round(lag_ms, 3)
+            stats["max_ms"] = round(max(stats["max_ms"], lag_ms), 3)
+            stats["mean_ms"] = round(stats["mean_ms"] + (lag_ms - stats["mean_ms"]) / stats["probes"], 3)
+
+    def metrics(self):
+        return {
+            "loop_latency": dict(self.loop_latency),
+            "sampling": self.sampler.stats(self.ads1115.read_count),
+            "pump_queue": (self._pump_jobs.qsize() if self._pump_jobs else 0) + len(self._pending_jobs),
+            "pump_duty": self.control.pump.scheduler.stats(time.time()) if self.control.pump.scheduler else None,
+            "latest_readings": self.latest_readings,
+            "telemetry": dict(self.control.telemetry.stats, pending=self.control.telemetry.pending_records)
+            if self.control.telemetry else None
+        }
+
 # --- Hauptteil ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hauptbewässerungssystem")
+    parser.add_argument("--trace", metavar="DATEI", help="Sensorwerte, GPIO-Flanken und Pumpenschaltungen in eine Trace-Datei aufzeichnen")
+    parser.add_argument("--runtime", choices=("async", "threads"), default="async",
+                        help="asyncio-Laufzeit (Standard) oder die bisherige Thread-Variante")
+    parser.add_argument("--telemetry", metavar="HOST[:PORT]", help="Telemetrie an einen Sammler (plant_telemetry.py collect) senden")
+    parser.add_argument("--telemetry-protocol", choices=("tcp", "udp"), default="tcp")
+    parser.add_argument("--node-id", default=socket.gethostname(), help="Name dieses Knotens in der Telemetrie")
+    args = parser.parse_args()
+
+    setup_logging(ring_file=RECENT_EVENTS_FILE)
+    recorder = TraceRecorder(args.trace) if args.trace else None
     load_config_for_system()
     initialize_pump_command_file()
     load_watering_status()
+    watering_status["pump_running"] = False
 
-    ads1115 = ADS1115()
-    pump = Pump()
+    ads1115 = ADS1115(recorder=recorder)
+    # In der asyncio-Laufzeit meldet die Pumpen-Task den Zustand selbst aus dem Loop-Thread.
+    # Die Einschaltdauer-Begrenzung wartet zwischen den Teilgaben; in der Thread-Laufzeit
+    # würde das den Timer- bzw. Befehls-Thread blockieren.
+    pump = Pump(on_state_change=on_pump_state_change if args.runtime == "threads" else None, recorder=recorder,
+                scheduler=PumpDutyScheduler() if args.runtime == "async" else None)
+    if args.runtime == "threads":
+        logger.warning("Begrenzung der Pumpen-Einschaltdauer (Pausen, Drosselung) ist nur in der asyncio-Laufzeit aktiv.")
     prewatercheck = PreWateringCheck(ads1115)
-    wateringcontrol = WateringControl(pump, prewatercheck)
+    telemetry = None
+    if args.telemetry:
+        if args.runtime == "async":
+            host, _, port = args.telemetry.partition(":")
+            telemetry = TelemetryExporter(args.node_id, host, int(port or TELEMETRY_PORT), args.telemetry_protocol)
+        else:
+            logger.warning("Telemetrie wird nur in der asyncio-Laufzeit unterstützt.")
+    # Die Anomalieerkennung wird nur von der Sensor-Task der asyncio-Laufzeit gespeist
+    detector = AnomalyDetector() if args.runtime == "async" else None
+    if detector is None:
+        logger.warning("Anomalieerkennung (Trockenlauf, Leck, hängende Sensoren) ist nur in der asyncio-Laufzeit aktiv; "
+                       "automatische Bewässerungen werden nicht blockiert.")
+    wateringcontrol = WateringControl(pump, prewatercheck, HistoryStore(), detector, telemetry)
 
     try:
-        print("\n--- Hauptbewässerungssystem gestartet ---")
-        wateringcontrol.start()
-        print("System läuft. Drücken Sie Strg+C zum Beenden.")
-        while True:
-            wateringcontrol.process_manual_pump_commands()
-            time.sleep(0.5)
+        logger.info("--- Hauptbewässerungssystem gestartet ---")
+        logger.info("System läuft. Drücken Sie Strg+C zum Beenden.")
+        if args.runtime == "async":
+            asyncio.run(AsyncWateringRuntime(wateringcontrol, ads1115).run())
+        else:
+            wateringcontrol.start()
+            next_housekeeping = 0.0
+            while True:
+                wateringcontrol.process_manual_pump_commands()
+                if time.time() >= next_housekeeping:
+                    wateringcontrol.housekeeping()
+                    next_housekeeping = time.time() + HOUSEKEEPING_INTERVAL_S
+                time.sleep(COMMAND_POLL_INTERVAL_S)
 
     except KeyboardInterrupt:
-        print("\nProgramm durch Benutzer beendet.")
+        logger.info("Programm durch Benutzer beendet.")
     except Exception as e:
-        print(f"\nEin kritischer Fehler ist aufgetreten: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.critical("Ein kritischer Fehler ist aufgetreten: %s", e, exc_info=True)
     finally:
         wateringcontrol.stop()
+        if recorder:
+            recorder.close()
         import RPi.GPIO as GPIO
         GPIO.cleanup()
-        print("GPIO-Bereinigung abgeschlossen. Programm beendet.")
+        logger.info("GPIO-Bereinigung abgeschlossen. Programm beendet.")
 
@@ -1,17 +1,22 @@
 import tkinter as tk
 from tkinter import messagebox
+import os
 import json
 import time
 import threading
+import queue
 import sys
+import logging
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 # Annahme, dass RPi.GPIO auf einem Raspberry Pi verfügbar ist.
 # Für Tests auf anderen Systemen kann dies auskommentiert werden.
 try:
     import RPi.GPIO as GPIO
 except (ImportError, RuntimeError):
-    print("Warnung: RPi.GPIO konnte nicht importiert werden. Laufe im Mock-Modus.")
+    logger.warning("RPi.GPIO konnte nicht importiert werden. Laufe im Mock-Modus.")
     # Mock-GPIO für Testzwecke auf Nicht-Pi-Systemen
     class MockGPIO:
         def __getattr__(self, name):
@@ -20,16 +25,20 @@ except (ImportError, RuntimeError):
 
 # Importiere die Hardware-Utilities
 try:
-    from pi_hardware_utils import ADS1115, TANK_VOLUME
+    from pi_hardware_utils import ADS1115, AdaptiveSampler, TANK_VOLUME
+    from plant_history import HistoryStore, minmax_buckets
+    from plant_logging import setup_logging, recent_events, read_recent_events
 except ImportError:
-    messagebox.showerror("Import Error", "Fehler: 'pi_hardware_utils.py' konnte nicht gefunden werden.\n"
-                                         "Bitte stellen Sie sicher, dass 'pi_hardware_utils.py' im selben Verzeichnis liegt.")
+    messagebox.showerror("Import Error", "Fehler: 'pi_hardware_utils.py', 'plant_history.py' oder 'plant_logging.py' konnte nicht gefunden werden.\n"
+                                         "Bitte stellen Sie sicher, dass alle Dateien im selben Verzeichnis liegen.")
     sys.exit(1)
 
 # --- Globale Konfiguration und Statusdateien ---
 CONFIG_FILE = 'config.json'
 PUMP_COMMAND_FILE = 'pump_command.json'
 WATERING_STATUS_FILE = 'watering_status.json'
+STATUS_POLL_INTERVAL_S = 1.0  # Maximales Intervall zum Einlesen der Statusdatei (kein I2C-Zugriff)
+STATUS_FRESH_S = 15.0  # Jünger ist die Statusdatei, läuft das Hauptsystem (speichert alle 5 s)
 
 # Standardwerte für die Pflanzenbewässerung
 DEFAULT_CONFIG = {
@@ -44,49 +53,82 @@ current_config = {}
 # --- Helper-Klasse für Daten-Updates aus dem Hintergrund ---
 class HardwareMonitor(threading.Thread):
     """
-    Ein Thread, der periodisch Sensordaten und Statusdateien liest,
-    um die Haupt-GUI nicht zu blockieren.
+    Ein Thread, der Sensordaten und Statusdateien liest, um die Haupt-GUI
+    nicht zu blockieren. Die Sensoren werden adaptiv abgetastet: schnell
+    während die Pumpe läuft, mittel rund um eine Bewässerung und selten im
+    Ruhezustand. Die Statusdatei wird unabhängig davon regelmäßig gelesen.
+    Meldet das Hauptsystem (asyncio-Laufzeit) dort aktuelle Messwerte, werden
+    diese übernommen und nur das Hauptsystem schreibt Messwerte in den
+    Verlauf; selbst abgetastet wird nur ohne laufendes Hauptsystem.
     """
     def __init__(self, app_controller, ads_instance):
         super().__init__(daemon=True)
         self.controller = app_controller
         self.ads1115 = ads_instance
+        self.sampler = AdaptiveSampler()
+        self.history = HistoryStore()
+        # Neue Verlaufseinträge für die inkrementelle Diagrammaktualisierung im GUI-Thread
+        self.history_updates = queue.Queue()
         self.stop_event = threading.Event()
         self.latest_data = {
             "moisture": 0,
             "tank_ml": 0.0,
             "tank_percent": 0,
-            "status": {}
+            "status": {},
+            "sampling": self.sampler.stats()
         }
 
     def run(self):
         """Hauptschleife des Threads."""
+        # Bereinigt wird der Verlauf nur vom Hauptsystem, das laufend anhängt
+        self.history.refresh()
         while not self.stop_event.is_set():
             try:
-                moisture = self.ads1115.moisture_sensor_status()
-                tank_ml = self.ads1115.tank_level_ml()
-                tank_percent = self.ads1115.tank_level()
-
                 status = {}
+                status_time = 0.0
                 try:
                     with open(WATERING_STATUS_FILE, 'r') as f:
+                        status_time = os.fstat(f.fileno()).st_mtime
                         status = json.load(f)
                 except (FileNotFoundError, json.JSONDecodeError):
                     pass
 
-                self.latest_data = {
-                    "moisture": moisture,
-                    "tank_ml": tank_ml,
-                    "tank_percent": tank_percent,
-                    "status": status
-                }
+                now = time.time()
+                self.sampler.update(now, bool(status.get("pump_running")), status.get("estimated_next_watering_time"))
+
+                data = dict(self.latest_data, status=status)
+                metrics = status.get("metrics") or {}
+                readings = metrics.get("latest_readings") or {}
+                if now - status_time <= STATUS_FRESH_S and readings.get("time"):
+                    # Messwerte des Hauptsystems übernehmen, kein eigener I2C-Zugriff
+                    data["moisture"] = readings["moisture"]
+                    data["tank_percent"] = readings["tank_percent"]
+                    data["tank_ml"] = (readings["tank_percent"] / 100) * TANK_VOLUME
+                    data["sampling"] = metrics.get("sampling") or self.sampler.stats(self.ads1115.read_count)
+                elif self.sampler.due(now):
+                    # Tankfüllstand nur einmal lesen und das Volumen daraus berechnen
+                    tank_percent = self.ads1115.tank_level()
+                    data["moisture"] = self.ads1115.moisture_sensor_status()
+                    data["tank_percent"] = tank_percent
+                    data["tank_ml"] = (tank_percent / 100) * TANK_VOLUME
+                    self.sampler.mark_sampled(now)
+                    self.history.append_sample(now, data["moisture"], tank_percent)
+                    data["sampling"] = self.sampler.stats(self.ads1115.read_count)
+
+                # Liest auch Messwerte und Bewässerungen ein, die das Hauptsystem protokolliert hat
+                new_samples, new_events = self.history.refresh()
+                for sample in new_samples:
+                    self.history_updates.put(("S", sample))
+                for event in new_events:
+                    self.history_updates.put(("W", event))
+                self.latest_data = data
 
                 self.controller.event_generate("<<DataUpdated>>", when="tail")
 
             except Exception as e:
-                print(f"Fehler im HardwareMonitor-Thread: {e}")
+                logger.error("Fehler im HardwareMonitor-Thread: %s", e, extra={"rate_limit_s": 60})
 
-            time.sleep(1)
+            self.stop_event.wait(min(self.sampler.interval, STATUS_POLL_INTERVAL_S))
 
     def stop(self):
         self.stop_event.set()
@@ -106,9 +148,9 @@ def save_config():
     try:
         with open(CONFIG_FILE, 'w') as f:
             json.dump([current_config], f, indent=4)
-        print("Konfiguration gespeichert.")
+        logger.info("Konfiguration gespeichert.")
     except Exception as e:
-        print(f"Fehler beim Speichern der Konfiguration: {e}")
+        logger.error("Fehler beim Speichern der Konfiguration: %s", e)
 
 def send_pump_command(action, amount_ml=None, duration_s=None):
     try:
@@ -129,7 +171,7 @@ def send_pump_command(action, amount_ml=None, duration_s=None):
                 pass
         return False
     except Exception as e:
-        print(f"Fehler beim Senden des Pumpenbefehls: {e}")
+        logger.error("Fehler beim Senden des Pumpenbefehls: %s", e)
         return False
 
 # --- GUI-Anwendungsklasse ---
@@ -149,10 +191,12 @@ class PlantWateringApp(tk.Tk):
         self.grid_rowconfigure(1, weight=0)
         self.grid_columnconfigure(0, weight=1)
 
+        # Der Monitor wird vor den Frames angelegt, da der Verlauf seinen HistoryStore nutzt
+        self.hardware_monitor = HardwareMonitor(self, ads_instance)
+
         self.create_frames()
         self.create_sensor_status_display()
 
-        self.hardware_monitor = HardwareMonitor(self, ads_instance)
         self.hardware_monitor.start()
 
         self.bind("<<DataUpdated>>", self.update_ui_from_monitor)
@@ -165,7 +209,7 @@ class PlantWateringApp(tk.Tk):
         self.reset_idle_timer()
 
     def create_frames(self):
-        for F in (MainMenuFrame, WateringSettingsFrame, ManualControlFrame, RepotConfigFrame, IdleScreenFrame):
+        for F in (MainMenuFrame, WateringSettingsFrame, ManualControlFrame, RepotConfigFrame, HistoryFrame, EventLogFrame, IdleScreenFrame):
             frame_name = F.__name__.replace("Frame", "").lower()
             frame = F(self, self)
             self.frames[frame_name] = frame
@@ -183,11 +227,18 @@ class PlantWateringApp(tk.Tk):
         self.tank_label.grid(row=0, column=1, padx=2, pady=2, sticky="ew")
         self.remaining_waterings_label = tk.Label(self.sensor_status_frame, text="Gießvorgänge: --", font=("Inter", 14), fg="white", bg="#34495e")
         self.remaining_waterings_label.grid(row=0, column=2, padx=2, pady=2, sticky="ew")
+        # Abtastmodus und Buslast des HardwareMonitors
+        self.sampling_label = tk.Label(self.sensor_status_frame, text="Abtastung: --", font=("Inter", 10), fg="#bdc3c7", bg="#34495e")
+        self.sampling_label.grid(row=1, column=0, columnspan=3, padx=2, sticky="ew")
+        # Aktive Anomalien des Hauptsystems, nur sichtbar, wenn welche vorliegen
+        self.anomaly_label = tk.Label(self.sensor_status_frame, text="", font=("Inter", 12, "bold"), fg="white", bg="#c0392b")
+        self.anomaly_label.grid(row=2, column=0, columnspan=3, padx=2, pady=2, sticky="ew")
+        self.anomaly_label.grid_remove()
 
     def show_frame(self, frame_name):
         # KORREKTUR: Sicherstellen, dass der Frame-Name existiert
         if frame_name not in self.frames:
-            print(f"Fehler: Frame '{frame_name}' nicht gefunden!")
+            logger.error("Frame '%s' nicht gefunden!", frame_name)
             return
 
         frame = self.frames[frame_name]
@@ -203,10 +254,29 @@ class PlantWateringApp(tk.Tk):
         self.moisture_label.config(text=f"Feuchtigkeit: {data['moisture']}%")
         self.tank_label.config(text=f"Tank: {data['tank_ml']:.0f}ml ({data['tank_percent']}%)")
         self.remaining_waterings_label.config(text=f"Gießvorgänge: {status.get('remaining_watering_cycles', '--')}")
+        sampling = data["sampling"]
+        self.sampling_label.config(text=f"Abtastung: {sampling['mode']} alle {sampling['interval_s']:g} s, "
+                                        f"{sampling['rate_changes']} Ratenwechsel, {sampling['i2c_reads_per_min']} I2C-Lesungen/min")
+        anomalies = status.get("anomalies") or {}
+        if anomalies:
+            self.anomaly_label.config(text="Anomalie: " + "; ".join(anomalies.values()))
+            self.anomaly_label.grid()
+        else:
+            self.anomaly_label.grid_remove()
 
         if hasattr(self.current_frame, 'update_data'):
             self.current_frame.update_data(data)
 
+        # Neue Verlaufseinträge immer abholen, damit sich die Queue nicht füllt;
+        # ein gerade nicht sichtbares Diagramm wird beim Anzeigen neu aufgebaut.
+        while True:
+            try:
+                kind, entry = self.hardware_monitor.history_updates.get_nowait()
+            except queue.Empty:
+                break
+            if hasattr(self.current_frame, 'add_history_entry'):
+                self.current_frame.add_history_entry(kind, entry)
+
     def exit_program(self):
         if messagebox.askyesno("Beenden", "Möchten Sie das Programm wirklich beenden?"):
             self.hardware_monitor.stop()
@@ -232,10 +302,11 @@ class MainMenuFrame(BaseMenuFrame):
     def create_widgets(self):
         tk.Label(self, text="HAUPTMENÜ", font=("Inter", 24, "bold"), fg="white", bg="#2c3e50").pack(pady=20)
         button_style = {"font": ("Inter", 18), "bg": "#3498db", "fg": "white", "padx": 20, "pady": 10, "relief": "raised", "bd": 3, "width": 25}
-        tk.Button(self, text="1. Gießeinstellungen", command=lambda: self.controller.show_frame("wateringsettings"), **button_style).pack(pady=10)
-        tk.Button(self, text="2. Manuelle Steuerung", command=lambda: self.controller.show_frame("manualcontrol"), **button_style).pack(pady=10)
-        tk.Button(self, text="3. Ich habe umgetopft!", command=lambda: self.controller.show_frame("repotconfig"), **button_style).pack(pady=10)
-        tk.Button(self, text="4. Programm beenden", command=self.controller.exit_program, **button_style).pack(pady=10)
+        tk.Button(self, text="1. Gießeinstellungen", command=lambda: self.controller.show_frame("wateringsettings"), **button_style).pack(pady=6)
+        tk.Button(self, text="2. Manuelle Steuerung", command=lambda: self.controller.show_frame("manualcontrol"), **button_style).pack(pady=6)
+        tk.Button(self, text="3. Ich habe umgetopft!", command=lambda: self.controller.show_frame("repotconfig"), **button_style).pack(pady=6)
+        tk.Button(self, text="4. Verlauf", command=lambda: self.controller.show_frame("history"), **button_style).pack(pady=6)
+        tk.Button(self, text="5. Programm beenden", command=self.controller.exit_program, **button_style).pack(pady=6)
 
 class WateringSettingsFrame(BaseMenuFrame):
     def create_widgets(self):
@@ -392,6 +463,200 @@ class RepotConfigFrame(BaseMenuFrame):
         threading.Thread(target=lambda: send_pump_command("repot_reset"), daemon=True).start()
         self.controller.show_frame("mainmenu")
 
+class HistoryChart(tk.Canvas):
+    """
+    Diagramm für Feuchtigkeit und Tankfüllstand (beide in %) mit markierten
+    Bewässerungen. Die Messwerte werden auf eine Min/Max-Spalte pro Pixel
+    reduziert. Neue Messwerte ändern nur die letzte Spalte; beginnt eine neue
+    Spalte, wird der Inhalt verschoben statt neu gezeichnet.
+    """
+    MARGIN_LEFT = 45
+    MARGIN = 10
+    # (Name, Index im Messwert-Tupel, Farbe)
+    SERIES = (("moisture", 1, "#2ecc71"), ("tank", 2, "#3498db"))
+    EVENT_COLOR = "#f39c12"
+
+    def __init__(self, parent, history, **kwargs):
+        super().__init__(parent, bg="#1a2b3c", highlightthickness=0, **kwargs)
+        self.history = history
+        self.span_s = 86400
+        self.columns = 0
+        self.bucket_s = 1.0
+        self.start = 0.0
+        self.buckets = {}
+        self.items = {}
+        self.event_items = []  # (zeitstempel, canvas_id)
+        self.bind("<Configure>", lambda event: self.rebuild())
+
+    def set_span(self, span_s):
+        self.span_s = span_s
+        self.rebuild()
+
+    def _x(self, column):
+        return self.MARGIN_LEFT + column
+
+    def _y(self, value):
+        bottom = self.winfo_height() - self.MARGIN
+        return bottom - (value / 100) * (bottom - self.MARGIN)
+
+    def rebuild(self):
+        """Baut das Diagramm für den gewählten Zeitraum vollständig neu auf."""
+        self.delete("all")
+        self.columns = max(1, self.winfo_width() - self.MARGIN_LEFT - self.MARGIN)
+        self.bucket_s = self.span_s / self.columns
+        # Spaltengrenzen an festen Zeitpunkten ausrichten; die letzte Spalte enthält "jetzt"
+        now = time.time()
+        self.start = (now // self.bucket_s + 1 - self.columns) * self.bucket_s
+
+        for value in (0, 50, 100):
+            y = self._y(value)
+            self.create_line(self.MARGIN_LEFT, y, self._x(self.columns), y, fill="#34495e", dash=(2, 4))
+            self.create_text(self.MARGIN_LEFT - 5, y, text=f"{value}%", anchor="e", fill="#95a5a6", font=("Inter", 10))
+
+        samples = self.history.samples_between(self.start, now + self.bucket_s)
+        for name, index, _ in self.SERIES:
+            self.buckets[name] = minmax_buckets(samples, self.start, self.bucket_s, self.columns, index)
+            self.items[name] = [None] * self.columns
+            for column in range(self.columns):
+                self._draw_column(name, column)
+
+        self.event_items = []
+        for timestamp, _ in self.history.events_between(self.start, now + self.bucket_s):
+            self._draw_event(timestamp)
+
+    def _draw_column(self, name, column):
+        bucket = self.buckets[name][column]
+        if bucket is None:
+            return
+        x = self._x(column)
+        low, high, last = (self._y(value) for value in bucket)
+        if low == high:
+            high -= 1  # Mindestens ein Pixel hoch, sonst zeichnet Tk nichts
+        coords = []
+        previous = self.buckets[name][column - 1] if column > 0 else None
+        if previous is not None:
+            # An den letzten Wert der Vorgängerspalte anschließen; Lücken bleiben sichtbar
+            coords += [x - 1, self._y(previous[2])]
+        coords += [x, low, x, high, x, last]
+
+        item = self.items[name][column]
+        if item is None:
+            color = next(c for n, _, c in self.SERIES if n == name)
+            self.items[name][column] = self.create_line(*coords, fill=color, tags=("data",))
+        else:
+            self.coords(item, *coords)
+
+    def _draw_event(self, timestamp):
+        x = self._x((timestamp - self.start) / self.bucket_s)
+        item = self.create_line(x, self.MARGIN, x, self.winfo_height() - self.MARGIN,
+                                fill=self.EVENT_COLOR, dash=(4, 2), tags=("event",))
+        self.event_items.append((timestamp, item))
+
+    def _scroll(self, shift):
+        """Verschiebt das Diagramm um `shift` Spalten nach links."""
+        if shift >= self.columns:
+            self.rebuild()
+            return
+        self.start += shift * self.bucket_s
+        self.move("data", -shift, 0)
+        self.move("event", -shift, 0)
+        for name, _, _ in self.SERIES:
+            for item in self.items[name][:shift]:
+                if item is not None:
+                    self.delete(item)
+            self.items[name] = self.items[name][shift:] + [None] * shift
+            self.buckets[name] = self.buckets[name][shift:] + [None] * shift
+            # Die neue erste Spalte hat keinen sichtbaren Vorgänger mehr
+            self._draw_column(name, 0)
+        while self.event_items and self.event_items[0][0] < self.start:
+            self.delete(self.event_items.pop(0)[1])
+
+    def add_sample(self, sample):
+        column = int((sample[0] - self.start) // self.bucket_s)
+        if column < 0:
+            return
+        if column >= self.columns:
+            self._scroll(column - self.columns + 1)
+            column = min(int((sample[0] - self.start) // self.bucket_s), self.columns - 1)
+        for name, index, _ in self.SERIES:
+            value = sample[index]
+            bucket = self.buckets[name][column]
+            if bucket is None:
+                self.buckets[name][column] = [value, value, value]
+            else:
+                bucket[0] = min(bucket[0], value)
+                bucket[1] = max(bucket[1], value)
+                bucket[2] = value
+            self._draw_column(name, column)
+
+    def add_event(self, event):
+        if event[0] >= self.start:
+            self._draw_event(event[0])
+
+class HistoryFrame(BaseMenuFrame):
+    SPANS = (("24 h", 86400), ("7 Tage", 7 * 86400), ("30 Tage", 30 * 86400))
+
+    def create_widgets(self):
+        header = tk.Frame(self, bg="#2c3e50")
+        header.pack(fill="x", padx=10, pady=5)
+        tk.Label(header, text="VERLAUF", font=("Inter", 20, "bold"), fg="white", bg="#2c3e50").pack(side="left")
+        tk.Button(header, text="Ereignisse", font=("Inter", 14), bg="#f39c12", fg="white",
+                  command=lambda: self.controller.show_frame("eventlog")).pack(side="right", padx=5)
+        for text, span_s in reversed(self.SPANS):
+            tk.Button(header, text=text, font=("Inter", 14), bg="#3498db", fg="white",
+                      command=lambda s=span_s: self.chart.set_span(s)).pack(side="right", padx=5)
+
+        legend = tk.Frame(self, bg="#2c3e50")
+        legend.pack(fill="x", padx=10)
+        tk.Label(legend, text="■ Feuchtigkeit", font=("Inter", 12), fg="#2ecc71", bg="#2c3e50").pack(side="left", padx=5)
+        tk.Label(legend, text="■ Tank", font=("Inter", 12), fg="#3498db", bg="#2c3e50").pack(side="left", padx=5)
+        tk.Label(legend, text="┆ Bewässerung", font=("Inter", 12), fg=HistoryChart.EVENT_COLOR, bg="#2c3e50").pack(side="left", padx=5)
+
+        self.chart = HistoryChart(self, self.controller.hardware_monitor.history)
+        self.chart.pack(fill="both", expand=True, padx=10, pady=5)
+        tk.Button(self, text="Zurück", font=("Inter", 16), bg="#e74c3c", fg="white", command=lambda: self.controller.show_frame("mainmenu")).pack(pady=5)
+
+    def on_show(self):
+        self.chart.rebuild()
+
+    def add_history_entry(self, kind, entry):
+        if kind == "S":
+            self.chart.add_sample(entry)
+        else:
+            self.chart.add_event(entry)
+
+class EventLogFrame(BaseMenuFrame):
+    """Zeigt die letzten Ereignisse des Hauptsystems und der UI."""
+    MAX_EVENTS = 200
+
+    def create_widgets(self):
+        tk.Label(self, text="EREIGNISSE", font=("Inter", 20, "bold"), fg="white", bg="#2c3e50").pack(pady=5)
+        list_frame = tk.Frame(self, bg="#2c3e50")
+        list_frame.pack(fill="both", expand=True, padx=10)
+        scrollbar = tk.Scrollbar(list_frame)
+        scrollbar.pack(side="right", fill="y")
+        self.listbox = tk.Listbox(list_frame, font=("Inter", 11), bg="#1a2b3c", fg="#ecf0f1", yscrollcommand=scrollbar.set)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        scrollbar.config(command=self.listbox.yview)
+
+        btn_frame = tk.Frame(self, bg="#2c3e50")
+        btn_frame.pack(pady=5)
+        tk.Button(btn_frame, text="Aktualisieren", font=("Inter", 16), bg="#3498db", fg="white", command=self.on_show).pack(side="left", padx=10)
+        tk.Button(btn_frame, text="Zurück", font=("Inter", 16), bg="#e74c3c", fg="white", command=lambda: self.controller.show_frame("history")).pack(side="left", padx=10)
+
+    def on_show(self):
+        events = read_recent_events(limit=self.MAX_EVENTS) + recent_events(self.MAX_EVENTS)
+        events.sort(key=lambda event: event.get("time", 0), reverse=True)
+        self.listbox.delete(0, "end")
+        for event in events[:self.MAX_EVENTS]:
+            timestamp = datetime.fromtimestamp(event.get("time", 0)).strftime("%d.%m. %H:%M:%S")
+            message = event.get("message", "").splitlines()[0] if event.get("message") else ""
+            self.listbox.insert("end", f"{timestamp}  {event.get('level', ''):<7}  {message}")
+            if event.get("level") in ("ERROR", "CRITICAL"):
+                self.listbox.itemconfig("end", fg="#e74c3c")
+            elif event.get("level") == "WARNING":
+                self.listbox.itemconfig("end", fg="#f39c12")
+
 class IdleScreenFrame(BaseMenuFrame):
     def create_widgets(self):
         self.configure(bg="#1a2b3c")
@@ -427,15 +692,14 @@ class IdleScreenFrame(BaseMenuFrame):
 
 # --- Hauptprogramm-Logik ---
 if __name__ == "__main__":
+    setup_logging()
     try:
         load_config()
         ads1115 = ADS1115()
         app = PlantWateringApp(ads1115)
         app.mainloop()
     except Exception as e:
-        print(f"\nEin kritischer Fehler ist beim Start aufgetreten: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.critical("Ein kritischer Fehler ist beim Start aufgetreten: %s", e, exc_info=True)
     finally:
         GPIO.cleanup()
-        print("Programm beendet.")
+        logger.info("Programm beendet.")